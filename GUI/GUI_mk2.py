@@ -7,10 +7,13 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolb
 from matplotlib.figure import Figure
 import tkinter as tk
 import os
+import time
 from tkinter import filedialog
-from pulson440_unpack import main
+from pulson440_unpack import plot_rti
 from final_script_gui import Script
 
+FRAME_INTERVAL = 0.2 #seconds between redraws of an image being refined
+
 class GUI(tk.Tk):
     def __init__(self):
         tk.Tk.__init__(self)
@@ -310,10 +313,8 @@ class Unpack(tk.Frame):
         return self.directory.get()
         
     def unpack(self):
-        name = self.directory.get()
-        self.f, self.ax, self.img = main(['-f', name, '-v'])
-        
         self.data = Script(self.directory.get(), self.directory2.get(), self.directory3.get())
+        self.f, self.ax, self.img = plot_rti(self.data.radar_data)
         
         self.edge_x, self.edge_y = self.data.get_graph()
         
@@ -403,6 +404,12 @@ class Unpack(tk.Frame):
     
     def get_data(self):
         return self.data
+    
+    def set_offsets(self, time_offset, range_offset):
+        self.time_offset_entry.delete(0, "end")
+        self.time_offset_entry.insert(0, str(time_offset))
+        self.range_offset_entry.delete(0, "end")
+        self.range_offset_entry.insert(0, str(range_offset))
         
 class Image(tk.Frame):
     
@@ -435,6 +442,12 @@ class Image(tk.Frame):
         self.back_projection_button.place(anchor="w", relwidth=0.17, relheight=0.1, relx=0.815, rely=0.3)
         self.entropy_button = tk.Button(self, text="Entropy", font=("Arial 18"), command=self.entropy_method)
         self.entropy_button.place(anchor="w", relwidth=0.17, relheight=0.1, relx=0.815, rely=0.45)
+        self.autofocus_button = tk.Button(self, text="Autofocus", font=("Arial 18"), command=self.autofocus_method)
+        self.autofocus_button.place(anchor="w", relwidth=0.17, relheight=0.1, relx=0.815, rely=0.6)
+        self.patch_label = tk.Label(self, text="Patch (m)", font=("Arial 16 bold"), background=self.background_color, fg=self.text_color)
+        self.patch_label.place(anchor="w", relwidth=0.17, relheight=rowheight, relx=0.815, rely=0.71)
+        self.patch_entry = tk.Entry(self, font="Arial 20")
+        self.patch_entry.place(anchor="w", relwidth=0.17, relheight=rowheight, relx=0.815, rely=0.77)
         
         
         self.image_label = tk.Label(self, text="Image\ngoes here", font=("Arial 60"), relief="solid", borderwidth=3)
@@ -453,6 +466,22 @@ class Image(tk.Frame):
         self.canvas=FigureCanvasTkAgg(f, self)
         self.canvas.draw()
         self.canvas.get_tk_widget().place(anchor="w", relwidth=0.8, relheight=0.85, relx=0.001, rely=0.57)
+        
+    def autofocus_method(self):
+        self.meters = self.get_meters()
+        self.size = self.get_size()
+        self.eyeballing_start_time = self.get_upper()
+        self.eyeballing_end_time = self.get_lower()
+        self.time_offset = self.get_time_offset()
+        self.range_offset = self.get_range_offset()
+        
+        #the offsets found replace those in the unpack tab
+        unpack = self.master.master.get_Unpack()
+        self.time_offset, self.range_offset, f, ax, img = unpack.get_data().main_autofocus(self.meters, self.size, self.eyeballing_start_time, self.eyeballing_end_time, self.time_offset, self.range_offset, patch=self.get_patch())
+        unpack.set_offsets(self.time_offset, self.range_offset)
+        self.canvas=FigureCanvasTkAgg(f, self)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().place(anchor="w", relwidth=0.8, relheight=0.85, relx=0.001, rely=0.57)
 
         
     def back_projection(self):
@@ -463,12 +492,26 @@ class Image(tk.Frame):
         self.time_offset = self.get_time_offset()
         self.range_offset = self.get_range_offset()
         data = self.master.master.get_Unpack().get_data()
-        f, ax, img = data.main_func(self.meters, self.size, self.eyeballing_start_time, self.eyeballing_end_time, self.time_offset, self.range_offset)
-        self.canvas = FigureCanvasTkAgg(f, self)
+        self.canvas = None
+        f, ax, img = data.main_func(self.meters, self.size, self.eyeballing_start_time, self.eyeballing_end_time, self.time_offset, self.range_offset, callback=self.show_frame)
+        if self.canvas is None:
+            self.canvas = FigureCanvasTkAgg(f, self)
+            self.canvas.get_tk_widget().place(anchor="w", relwidth=0.8, relheight=0.85, relx=0.001, rely=0.57)
         self.canvas.draw()
-        self.canvas.get_tk_widget().place(anchor="w", relwidth=0.8, relheight=0.85, relx=0.001, rely=0.57)
         self.toolbar = NavigationToolbar2TkAgg(self.canvas, self)
         self.toolbar.update()
+    
+    def show_frame(self, f, ax, img):
+        #draw the coarse image at once and then its refinements every so often
+        if self.canvas is None:
+            self.canvas = FigureCanvasTkAgg(f, self)
+            self.canvas.get_tk_widget().place(anchor="w", relwidth=0.8, relheight=0.85, relx=0.001, rely=0.57)
+        elif time.time() - self.frame_time < FRAME_INTERVAL:
+            return
+        img.autoscale()
+        self.canvas.draw()
+        self.update_idletasks()
+        self.frame_time = time.time()
 
         
     def choose_directory(self, widget):
@@ -488,6 +531,11 @@ class Image(tk.Frame):
     def get_size(self):
         return int(self.size_entry.get())
     
+    def get_patch(self):
+        #blank autofocuses on the whole image
+        patch = self.patch_entry.get().strip()
+        return float(patch) if patch else None
+    
     def get_time_offset(self):
         return float(self.master.master.get_Unpack().get_time_offset())
     
@@ -497,5 +545,7 @@ class Image(tk.Frame):
     #def make_image():
         
 
-app = GUI()
-app.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    #guarded so that autofocus worker processes can import this module
+    app = GUI()
+    app.mainloop()
@@ -1,12 +1,13 @@
 import math
 import matplotlib.pyplot as plt
 import numpy as np
-from pulson440_formats import CONFIG_MSG_FORMAT
 from pulson440_constants import SPEED_OF_LIGHT, T_BIN, DN_BIN
+from pulson440_unpack import unpack
 import pandas
 import timeit
 from warnings import warn
 import pickle
+from focus_metrics import entropy
 
 DT_0 = 10
 pulse_data = 'Day6_zigzag_4'
@@ -20,114 +21,6 @@ eyeballing_end_time = 810
 
 #def start_back_projection(pulse_data_param, platform_position_data_param, given_object_param, size_param, width_param, eyeballing_time_start_param, eyeballing_end_time_param):
     
-def read_config_data(file_handle, legacy=False):
-    """
-    Read in configuration data based on platform.
-    """
-    config = dict.fromkeys(CONFIG_MSG_FORMAT.keys())
-    
-    if legacy:
-        config_msg = file_handle.read(44)
-        config['node_id'] = np.frombuffer(config_msg[4:8], dtype='>u4')[0]
-        config['scan_start'] = np.frombuffer(config_msg[8:12], dtype='>i4')[0]
-        config['scan_stop'] = np.frombuffer(config_msg[12:16], dtype='>i4')[0]
-        config['scan_res'] = np.frombuffer(config_msg[16:18], dtype='>u2')[0]
-        config['pii'] = np.frombuffer(config_msg[18:20], dtype='>u2')[0]
-        config['ant_mode'] = np.uint16(config_msg[32])
-        config['tx_gain_ind'] = np.uint16(config_msg[33])
-        config['code_channel'] = np.uint16(config_msg[34])
-        config['persist_flag'] = np.uint16(config_msg[35])
-        
-    else:
-        config_msg = file_handle.read(32)
-        byte_counter = 0
-        for config_field in CONFIG_MSG_FORMAT.keys():
-            num_bytes = CONFIG_MSG_FORMAT[config_field].itemsize
-            config_data = config_msg[byte_counter:(byte_counter + num_bytes)]
-            config[config_field] = np.frombuffer(config_data,
-                  dtype=CONFIG_MSG_FORMAT[config_field])[0]
-            config[config_field] = config[config_field].byteswap()
-            byte_counter += num_bytes
-            
-    return config
-
-def unpack(file, legacy=False):
-    """
-    Unpacks PulsOn 440 radar data from input file
-    """
-    with open(file, 'rb') as f:
-        
-        # Read configuration part of data
-        config = read_config_data(f, legacy)
-        
-        # Compute range bins in datas
-        scan_start_time = float(config['scan_start'])
-        start_range = SPEED_OF_LIGHT * ((scan_start_time * 1e-12) - DT_0 * 1e-9) / 2
-        
-        # Read data
-        data = dict()
-        data= {'scan_data': [],
-               'time_stamp': [],
-               'packet_ind': [],
-               'packet_pulse_ind': [],
-               'range_bins': [],
-               'config': config}
-        single_scan_data = []
-        packet_count = 0
-        pulse_count = 0
-        
-        while True:
-            
-            # Read a single data packet and break loop if not a complete packet
-            # (in terms of size)
-            packet = f.read(1452)
-            if len(packet) < 1452:
-                break            
-            
-            # Get information from first packet about how scans are stored and 
-            # range bins collected
-            if packet_count == 0:
-                num_range_bins = np.frombuffer(packet[44:48], dtype='>u4')[0]
-                num_packets_per_scan = np.frombuffer(packet[50:52], dtype='>u2')[0]
-                drange_bins = SPEED_OF_LIGHT * T_BIN * 1e-9 / 2
-                range_bins = start_range + drange_bins * np.arange(0, num_range_bins, 1)
-            packet_count += 1
-            
-            # Number of samples in current packet and packet index
-            num_samples = np.frombuffer(packet[42:44], dtype='>u2')[0]
-            data['packet_ind'].append(np.frombuffer(packet[48:50], dtype='>u2')[0])
-            
-            # Extract radar data samples from current packet; process last 
-            # packet within a scan seperately to get all data
-            packet_data = np.frombuffer(packet[52:(52 + 4 * num_samples)], 
-                                               dtype='>i4')
-            single_scan_data.append(packet_data)
-            
-            if packet_count % num_packets_per_scan == 0:
-                data['scan_data'].append(np.concatenate(single_scan_data))
-                data['time_stamp'].append(np.frombuffer(packet[8:12], 
-                    dtype='>u4')[0])
-                single_scan_data = []
-                pulse_count += 1
-            
-        # Add last partial scan if present
-        if single_scan_data:
-            single_scan_data = np.concatenate(single_scan_data)
-            num_pad = data['scan_data'][0].size - single_scan_data.size
-            single_scan_data = np.pad(single_scan_data, (0, num_pad), 
-                                      'constant', constant_values=0)
-            data['scan_data'].append(single_scan_data)
-                
-        # Stack scan data into 2-D array 
-        # (rows -> pulses, columns -> range bins)
-        data['scan_data'] = np.stack(data['scan_data'])
-        
-        # Finalize entries in data
-        data['time_stamp'] = np.asarray(data['time_stamp'])
-        data['range_bins'] = range_bins
-
-        return data
-
 def extract_complex_pulse():
     data = unpack(pulse_data)
     #f = open('railTestDiagonal.pkl', 'rb')
@@ -384,27 +277,7 @@ def test():
 '''ETHAN FANG CHANGE'''
 
 def get_entropy(magnitude_array):
-    entropy_sum = 0
-    minMag = magnitude_array[0][0] 
-    maxMag = magnitude_array[0][0]
-    for yy in range(len(magnitude_array)):
-        for xx in range(len(magnitude_array[yy])):
-            curr_mag = magnitude_array[yy][xx]
-            #print("max: " + str(maxMag) + "----- min: " + str(minMag))
-            if curr_mag > maxMag:
-                maxMag = curr_mag
-            if curr_mag < minMag:
-                minMag = curr_mag
-    
-    magDiff = np.abs(maxMag - minMag)
-    #print("magDiff = " + str(magDiff))
-    for yy in range(len(magnitude_array)):
-        for xx in range(len(magnitude_array[yy])):
-            curr_mag_final = np.abs(magnitude_array[yy][xx] - minMag)/magDiff
-            if (curr_mag_final != 0):
-                #print("currMagFinal: " + str(curr_mag_final))
-                entropy_sum += curr_mag_final*np.log2(curr_mag_final)
-    return -1*entropy_sum
+    return entropy(magnitude_array)
 
 #deviation is +- how far the time alignment should be tested. step is the difference in time
     #between each test
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+SAR autofocus over the time offset between radar and motion capture clocks
+and the range offset of the radar
+"""
+
+# Import the required modules
+import os
+import math
+import numpy as np
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from backprojection import interp_approach
+from backprojection_cache import GeometryCache
+from focus_metrics import focus_cost
+
+# Autofocus settings
+COARSE_STEP = 0.01 # Default step of the coarse time offset grid (s)
+COARSE_GRID = 64 # Fewest pixels across the grid of the coarse search
+OFFSET_TOLERANCE = 0.001 # Default time offset tolerance of optimize (s)
+RANGE_STEP = 0.02 # Default step of the coarse range offset grid (m)
+RANGE_TOLERANCE = 0.005 # Default range offset tolerance of optimize_2d (m)
+MAX_ROUNDS = 4 # Most alternating time and range searches of optimize_2d
+GOLDEN_RATIO = (math.sqrt(5) - 1) / 2
+
+# Autofocus instance of each worker process
+worker_autofocus = None
+
+def set_worker_autofocus(autofocus):
+    """
+    Worker process initializer; keeps the autofocus instance to evaluate,
+    imaging with a single thread since the processes share the CPUs, and
+    without a geometry cache, which would hold the ranges of every time
+    offset in every process.
+    """
+    global worker_autofocus
+    if 'workers' in autofocus.kwargs:
+        autofocus.kwargs['workers'] = 1
+    autofocus.kwargs.pop('geometry', None)
+    worker_autofocus = autofocus
+
+def worker_cost(offsets, decimation=1):
+    """
+    Focus cost of a (time offset, range offset) pair in a worker process.
+    """
+    return worker_autofocus.cost(offsets[0], decimation, offsets[1])
+
+def read_only(array):
+    """
+    Array that cannot be modified, so that it can be shared between
+    evaluations and worker processes.
+    """
+    array = np.asarray(array)
+    if array.flags.writeable:
+        array = array.view()
+        array.flags.writeable = False
+    return array
+
+def patch_grid(x_vec, y_vec, center, half_width):
+    """
+    Points of the grid x_vec, y_vec within half_width of center (x, y), at
+    the grid's own spacing so that a patch is focused as in the full image.
+    """
+    x_vec = np.asarray(x_vec)
+    y_vec = np.asarray(y_vec)
+    x_patch = x_vec[np.abs(x_vec - center[0]) <= half_width]
+    y_patch = y_vec[np.abs(y_vec - center[1]) <= half_width]
+    if len(x_patch) < 2 or len(y_patch) < 2:
+        raise ValueError('Patch of half width %g about (%g, %g) holds fewer '
+                         'than 2 grid points across' %
+                         (half_width, center[0], center[1]))
+    return x_patch, y_patch
+
+class Autofocus(object):
+    """
+    Images a window of pulses with the platform positions of candidate time
+    offsets between the radar and motion capture clocks, and candidate range
+    offsets subtracted from range_axis, and measures their focus. Motion
+    capture positions (x, y, z) at motion_times (s) are interpolated to the
+    pulses' radar_times (s) less the time offset and ordered as (x, z, y) for
+    imaging, as by the GUI scripts. Images are
+    formed by approach, called with kwargs, on the grid x_vec, y_vec, and
+    scored by the focus_metrics metric of the given name. Searches along the
+    range offset evaluated in this process keep the ranges of their time
+    offset in a GeometryCache of their own; other images compute them afresh,
+    as every time offset moves the platform positions.
+    """
+    def __init__(self, pulses, range_axis, radar_times, motion_times,
+                 motion_pos, x_vec, y_vec, metric='entropy',
+                 approach=interp_approach, **kwargs):
+        self.pulses = read_only(pulses)
+        self.range_axis = read_only(range_axis)
+        self.radar_times = read_only(radar_times)
+        self.motion_times = read_only(np.ravel(motion_times))
+        self.motion_pos = read_only(motion_pos)
+        self.x_vec = read_only(x_vec)
+        self.y_vec = read_only(y_vec)
+        self.metric = metric
+        self.approach = approach
+        self.kwargs = kwargs
+
+    def positions(self, time_offset):
+        """
+        Platform positions at each pulse for a time offset (s).
+        """
+        motion_times = self.motion_times - time_offset
+        return np.stack([np.interp(self.radar_times, motion_times,
+                                   self.motion_pos[:, ii])
+                         for ii in (0, 2, 1)], axis=1)
+
+    def image(self, time_offset, decimation=1, range_offset=0.0,
+              geometry=None):
+        """
+        Image formed with the platform positions of a time offset and the
+        range axis less a range offset on every decimation-th point of the
+        grid, with ranges from the geometry cache if given.
+        """
+        kwargs = self.kwargs
+        if geometry is not None:
+            kwargs = dict(kwargs, geometry=geometry)
+        return self.approach(self.pulses, self.range_axis - range_offset,
+                             self.positions(time_offset),
+                             self.x_vec[::decimation],
+                             self.y_vec[::decimation], **kwargs)
+
+    def cost(self, time_offset, decimation=1, range_offset=0.0,
+             geometry=None):
+        """
+        Focus cost of the image of a time and range offset; lower is better
+        focused. Only costs of the same decimation are comparable.
+        """
+        return focus_cost(self.image(time_offset, decimation, range_offset,
+                                     geometry), self.metric)
+
+    def evaluate(self, offsets, workers=None, decimation=1, geometry=None):
+        """
+        Focus cost of each (time offset, range offset) pair, evaluated over a
+        pool of 'workers' processes (all CPUs if None). Each worker receives
+        this instance once; where processes are forked its arrays are shared
+        rather than copied. The geometry cache, if given, serves only
+        evaluations in this process and is never sent to the workers.
+        """
+        offsets = [tuple(pair) for pair in offsets]
+        workers = min(workers or os.cpu_count(), len(offsets))
+        if workers <= 1:
+            costs = [self.cost(time_offset, decimation, range_offset,
+                               geometry)
+                     for (time_offset, range_offset) in offsets]
+        else:
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=set_worker_autofocus,
+                                     initargs=(self,)) as executor:
+                costs = list(executor.map(worker_cost, offsets,
+                                          repeat(decimation)))
+        return np.array(costs)
+
+    def sweep(self, time_offsets, workers=None, decimation=1,
+              range_offset=0.0):
+        """
+        Focus cost of each time offset at a range offset, evaluated as by
+        evaluate; returns the costs and the best time offset.
+        """
+        time_offsets = np.asarray(time_offsets, dtype=float)
+        costs = self.evaluate([(time_offset, range_offset)
+                               for time_offset in time_offsets],
+                              workers, decimation)
+        return costs, time_offsets[np.argmin(costs)]
+
+    def patch(self, center, half_width):
+        """
+        Autofocus of the same data imaging only the patch of the grid within
+        half_width of center (x, y), e.g. about a reference reflector; each
+        candidate costs the patch's fraction of the grid's area, and the
+        offsets found apply to the full grid.
+        """
+        x_vec, y_vec = patch_grid(self.x_vec, self.y_vec, center, half_width)
+        return Autofocus(self.pulses, self.range_axis, self.radar_times,
+                         self.motion_times, self.motion_pos, x_vec, y_vec,
+                         self.metric, self.approach, **self.kwargs)
+
+    def coarse_decimation(self):
+        """
+        Largest power of two decimation that leaves at least COARSE_GRID
+        points across the grid.
+        """
+        decimation = 1
+        while min(len(self.x_vec), len(self.y_vec)) >= \
+                COARSE_GRID * decimation * 2:
+            decimation *= 2
+        return decimation
+
+    def search(self, offsets, axis, low, high, step, tolerance, workers=None,
+               decimation=None):
+        """
+        Best value between low and high, to within tolerance, of the time
+        (axis 0) or range (axis 1) offset of the (time offset, range offset)
+        pair offsets. The values are first swept in steps of 'step' on every
+        decimation-th point of the grid (coarse_decimation by default), each
+        costing 1 / decimation**2 of a full image; golden-section search then
+        narrows the two steps about the best of them while the decimation is
+        halved, at even intervals of log bracket width, down to the full
+        grid. A search along the range offset holds the time offset, and so
+        the platform positions, fixed; its ranges are kept in a GeometryCache
+        of its own, dropped once it returns. Returns the best value and the
+        cost of the search in full images.
+        """
+        if decimation is None:
+            decimation = self.coarse_decimation()
+        geometry = GeometryCache() if axis == 1 else None
+
+        # Evaluate values of the searched offset at a decimation
+        def costs_of(values, decimation):
+            pairs = list()
+            for value in values:
+                pair = list(offsets)
+                pair[axis] = value
+                pairs.append(pair)
+            return self.evaluate(pairs, workers, decimation, geometry)
+
+        # Sweep the coarse grid of values on the coarse image grid
+        values = np.arange(low, high + step / 2, step)
+        costs = costs_of(values, decimation)
+        num_images = len(values) / decimation**2
+        index = int(np.argmin(costs))
+        a = values[max(index - 1, 0)]
+        b = values[min(index + 1, len(values) - 1)]
+        if b - a <= tolerance:
+            return values[index], num_images
+
+        # Golden-section search; both inner points are imaged afresh
+        # whenever the decimation is halved since only costs of the same
+        # decimation are comparable
+        first_width = b - a
+        num_levels = math.log2(decimation)
+        level_decimation = None
+        while b - a > tolerance:
+            progress = (math.log(first_width / (b - a)) /
+                        math.log(first_width / tolerance))
+            new_decimation = 2**int(round(num_levels * (1 - progress)))
+            if new_decimation != level_decimation:
+                level_decimation = new_decimation
+                (c, d) = (b - GOLDEN_RATIO * (b - a),
+                          a + GOLDEN_RATIO * (b - a))
+                (cost_c, cost_d) = costs_of([c, d], level_decimation)
+                num_images += 2 / level_decimation**2
+            if cost_c < cost_d:
+                (b, d, cost_d) = (d, c, cost_c)
+                c = b - GOLDEN_RATIO * (b - a)
+                cost_c = costs_of([c], level_decimation)[0]
+            else:
+                (a, c, cost_c) = (c, d, cost_d)
+                d = a + GOLDEN_RATIO * (b - a)
+                cost_d = costs_of([d], level_decimation)[0]
+            num_images += 1 / level_decimation**2
+
+        return (a + b) / 2, num_images
+
+    def optimize(self, low, high, step=COARSE_STEP, tolerance=OFFSET_TOLERANCE,
+                 workers=None, decimation=None, range_offset=0.0):
+        """
+        Best time offset between low and high, to within tolerance (s), at a
+        range offset, found by search from a sweep in steps of 'step'.
+        Returns the best offset and the cost of the search in full images.
+        """
+        return self.search((0.0, range_offset), 0, low, high, step,
+                           tolerance, workers, decimation)
+
+    def optimize_2d(self, time_low, time_high, range_low, range_high,
+                    time_step=COARSE_STEP, range_step=RANGE_STEP,
+                    time_tolerance=OFFSET_TOLERANCE,
+                    range_tolerance=RANGE_TOLERANCE, workers=None,
+                    rounds=MAX_ROUNDS):
+        """
+        Best pair of time offset between time_low and time_high (s) and range
+        offset between range_low and range_high (m), found by alternating
+        searches along each offset with the other held; the first round
+        sweeps the whole intervals on the coarse grid and later rounds two
+        steps either side of the current pair on the full grid, so that the
+        coarse grid does not bias the result, until neither offset moves by
+        more than its tolerance or after 'rounds' rounds. Each range search
+        keeps the platform positions, and so the ranges, of its time offset.
+        Returns the time offset, the range offset and the cost of the search
+        in full images.
+        """
+        time_offset = (time_low + time_high) / 2
+        range_offset = (range_low + range_high) / 2
+        num_images = 0
+        decimation = None
+        for ii in range(rounds):
+            if ii > 0:
+                (time_low, time_high) = (time_offset - 2 * time_step,
+                                         time_offset + 2 * time_step)
+                (range_low, range_high) = (range_offset - 2 * range_step,
+                                           range_offset + 2 * range_step)
+                decimation = 1
+            new_time_offset, time_images = self.search(
+                    (time_offset, range_offset), 0, time_low, time_high,
+                    time_step, time_tolerance, workers, decimation)
+            new_range_offset, range_images = self.search(
+                    (new_time_offset, range_offset), 1, range_low,
+                    range_high, range_step, range_tolerance, workers,
+                    decimation)
+            num_images += time_images + range_images
+            converged = (ii > 0 and
+                         abs(new_time_offset - time_offset) <= time_tolerance
+                         and abs(new_range_offset - range_offset) <=
+                         range_tolerance)
+            (time_offset, range_offset) = (new_time_offset, new_range_offset)
+            if converged:
+                break
+
+        return time_offset, range_offset, num_images
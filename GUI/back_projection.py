@@ -12,6 +12,7 @@ import timeit
 import argparse
 import sys
 import os
+from focus_metrics import entropy
 #from pulson440_constants import SPEED_OF_LIGHT
 
 
@@ -79,27 +80,7 @@ the image's entropy appropriately to to the ratio of one
 image's resolution to the other image resolution
 '''
 def get_entropy(magnitude_array):
-    entropy_sum = 0
-    minMag = magnitude_array[0][0] 
-    maxMag = magnitude_array[0][0]
-    for yy in range(len(magnitude_array)):
-        for xx in range(len(magnitude_array[yy])):
-            curr_mag = magnitude_array[yy][xx]
-            #print("max: " + str(maxMag) + "----- min: " + str(minMag))
-            if curr_mag > maxMag:
-                maxMag = curr_mag
-            if curr_mag < minMag:
-                minMag = curr_mag
-    
-    magDiff = np.abs(maxMag - minMag)
-    #print("magDiff = " + str(magDiff))
-    for yy in range(len(magnitude_array)):
-        for xx in range(len(magnitude_array[yy])):
-            curr_mag_final = np.abs(magnitude_array[yy][xx] - minMag)/magDiff
-            if (curr_mag_final != 0):
-                #print("currMagFinal: " + str(curr_mag_final))
-                entropy_sum += curr_mag_final*np.log2(curr_mag_final)
-    return -1*entropy_sum
+    return entropy(magnitude_array)
 
 def display_menu():
     print("\nThe signals have been successfully processed, please indicate which version of image you would like to view:")
@@ -7,112 +7,1037 @@ SAR backprojection image formation.
 import sys
 import os
 import numpy as np
+import time
 import argparse
 import pickle
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
-from scipy.misc import imsave
+from matplotlib.pyplot import imsave
 from pulson440_constants import SPEED_OF_LIGHT
 
-def shift_approach(pulses, range_axis, platform_pos, x_vec, y_vec):
+# Image formation settings
+SCRATCH_BYTES = 4 * 1024**2 # Size of the range scratch buffer of a block (bytes)
+BLOCK_PULSES = 16 # Default number of pulses backprojected at a time
+UPSAMPLE_FACTOR = 16 # Default upsampling of pulses by fourier_approach
+LEAF_PULSES = 16 # Default number of pulses in each subaperture of ffbp_approach
+MERGE_FACTOR = 4 # Default number of subapertures merged at each ffbp level
+OVERSAMPLE = 6.0 # Default oversampling of ffbp polar subimages
+CARRIER_POWER = 0.99 # Fraction of pulse power within the estimated bandwidth
+TRACK_TOLERANCE = 0.125 # Range error accepted from a straight track (cycles)
+STOLT_OVERSAMPLE = 2.0 # Default oversampling of omega_k_approach
+RANGE_MARGIN = 16 # Range bins kept beyond the image by omega_k_approach
+DYNAMIC_RANGE = 40 # Range of magnitudes compared by precision_error (dB)
+COARSE_PIXELS = 64**2 # Pixels of the first frame of progressive_approach
+COARSE_PULSES = 64 # Fewest pulses in the first frame of progressive_approach
+REFINE_TILE = 128 # Size of the tiles refined by progressive_approach (pixels)
+
+def map_tiles(function, tiles, workers=1):
     """
-    Backprojection using only discrete shifts.
+    Apply function to each tile over a pool of 'workers' threads (all CPUs if
+    None); tiles must cover disjoint parts of the image so that the image does
+    not depend on the order in which the tiles complete.
     """
-    
-def interp_approach(pulses, range_axis, platform_pos, x_vec, y_vec):
+    if workers == 1:
+        for tile in tiles:
+            function(tile)
+        return
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for _ in executor.map(function, tiles):
+            pass
+
+def block_ranges(x_dist_sq, y_dist_sq, z_dist_sq, block, two_way_range):
+    """
+    Compute the 2-way range between a block of platform positions and each
+    point in a tile of the image grid into two_way_range; y_dist_sq only covers
+    the tile's rows. Returns the block's part of two_way_range.
+    """
+    block_range = two_way_range[:len(z_dist_sq[block])]
+    np.add(x_dist_sq[block, np.newaxis, :], y_dist_sq[block, :, np.newaxis],
+           out=block_range)
+    block_range += z_dist_sq[block, np.newaxis, np.newaxis]
+    np.sqrt(block_range, out=block_range)
+    return block_range
+
+def complex_dtype(dtype):
+    """
+    Complex type of the same precision as a real dtype.
     """
-    Backprojection using interpolated shifts.
+    return np.result_type(dtype, np.complex64)
+
+def tiled_approach(tile_function, pulses, range_axis, platform_pos, x_vec,
+                   y_vec, block_pulses=BLOCK_PULSES, workers=1, tile=None,
+                   dtype=float, geometry=None):
+    """
+    Backprojection of tiles of 'tile' rows of the image by tile_function; the
+    tile size defaults to a scratch buffer of about SCRATCH_BYTES per tile.
+    Tiles are spread over 'workers' threads. Ranges, pulses and the image are
+    held at the precision of the real dtype (float64 or float32). Ranges are
+    taken from the geometry cache (see backprojection_cache) if one is given
+    and they fit within it; they do not depend on range_axis, so a changed
+    range offset is served from the cache.
     """
     # Ensure that the range_axis is a 1-D vector
-    range_axis = np.squeeze(range_axis)
+    dtype = np.dtype(dtype)
+    range_axis = np.squeeze(range_axis).astype(dtype, copy=False)
     
     # Determine dimensions of data
     num_pulses = pulses.shape[0]
+    x_vec = np.asarray(x_vec, dtype=dtype)
+    y_vec = np.asarray(y_vec, dtype=dtype)
+    num_x_pos = len(x_vec)
+    num_y_pos = len(y_vec)
+    if tile is None:
+        tile = max(1, SCRATCH_BYTES // (dtype.itemsize * block_pulses *
+                                        num_x_pos))
+    
+    # Squared distances between each platform position and each X and Y
+    # location of the image grid, unless the ranges to each point are cached
+    platform_pos = np.asarray(platform_pos, dtype=dtype)[:num_pulses]
+    ranges = None
+    if geometry is not None:
+        ranges = geometry.ranges(platform_pos, x_vec, y_vec, dtype)
+    if ranges is None:
+        x_dist_sq = (x_vec[np.newaxis, :] - platform_pos[:, 0:1])**2
+        y_dist_sq = (y_vec[np.newaxis, :] - platform_pos[:, 1:2])**2
+        z_dist_sq = platform_pos[:, 2]**2
+    
+    # Initialize SAR image; real returns are accumulated as real values
+    if np.iscomplexobj(pulses):
+        pulses = pulses.astype(complex_dtype(dtype), copy=False)
+        complex_image = np.zeros((num_y_pos, num_x_pos),
+                                 dtype=complex_dtype(dtype))
+    else:
+        pulses = pulses.astype(dtype, copy=False)
+        complex_image = np.zeros((num_y_pos, num_x_pos), dtype=dtype)
     
-    # X-Y locations of image grid
-    x_grid, y_grid = np.meshgrid(x_vec, y_vec)
+    # Backproject each tile of rows; tile_ranges gives the ranges of a block
+    # of pulses to the tile, computed into a scratch buffer if not cached
+    def backproject_tile(rows):
+        if ranges is None:
+            tile_ranges = partial(block_ranges, x_dist_sq, y_dist_sq[:, rows],
+                                  z_dist_sq)
+        else:
+            tile_ranges = lambda block, two_way_range: ranges[block, rows]
+        tile_function(pulses, range_axis, tile_ranges, complex_image[rows],
+                      block_pulses)
+    map_tiles(backproject_tile,
+              [slice(ii, ii + tile) for ii in range(0, num_y_pos, tile)],
+              workers)
+        
+    return complex_image.astype(complex_dtype(dtype))
+
+def shift_tile(pulses, range_axis, tile_ranges, image_tile,
+               block_pulses=BLOCK_PULSES):
+    """
+    Backproject all pulses onto a tile of rows of the image a block of pulses
+    at a time using the nearest range bin of each point.
+    """
+    (num_pulses, num_range_bins) = pulses.shape
+    range_res = (range_axis[-1] - range_axis[0]) / (num_range_bins - 1)
+    two_way_range = np.empty((block_pulses,) + image_tile.shape,
+                             dtype=range_axis.dtype)
     
-    # Initialize SAR image
-    complex_image = np.zeros_like(x_grid, dtype=np.complex)
+    # Pad each pulse with a zero sample at either end; ranges beyond the ends
+    # of the pulses are clipped onto these
+    padded_pulses = np.zeros((num_pulses, num_range_bins + 2),
+                             dtype=image_tile.dtype)
+    padded_pulses[:, 1:-1] = pulses
     
-    # Iterate over each pulse
-    for ii in range(0, num_pulses):
+    # Iterate over each block of pulses
+    for first in range(0, num_pulses, block_pulses):
+        block = slice(first, first + block_pulses)
+        block_range = tile_ranges(block, two_way_range)
         
-        # Compute the 2-way range between current platform position and each 
-        # point in the image grid
-        two_way_range_grid = np.sqrt((x_grid - platform_pos[ii, 0])**2 + 
-                                         (y_grid - platform_pos[ii, 1])**2 +
-                                         platform_pos[ii, 2]**2)
+        # Index of the nearest range bin of each point in the padded pulses;
+        # computed in the scratch buffer since cached ranges are read-only
+        bin_pos = np.multiply(block_range, 1 / range_res,
+                              out=two_way_range[:len(block_range)])
+        bin_pos += 1.5 - range_axis[0] / range_res
+        bins = bin_pos.astype(np.intp)
         
-        # Interpolate the current pulse's return to each range in the image 
-        # grid using linear interpolation
-        complex_image += np.interp(two_way_range_grid, range_axis, 
-                                   pulses[ii, :], left=0, right=0)
+        # Gather each pulse's sample at each point
+        for ii in range(len(bins)):
+            image_tile += np.take(padded_pulses[first + ii], bins[ii],
+                                  mode='clip')
+
+def shift_approach(pulses, range_axis, platform_pos, x_vec, y_vec,
+                   block_pulses=BLOCK_PULSES, workers=1, tile=None,
+                   dtype=float, geometry=None):
+    """
+    Backprojection using only discrete shifts; each point takes the sample of
+    its nearest range bin, found from the uniform spacing of range_axis, for
+    quick-look images. Tiles of rows are spread over workers, and the image
+    is formed at the precision of dtype with ranges from the geometry cache,
+    as in interp_approach.
+    """
+    return tiled_approach(shift_tile, pulses, range_axis, platform_pos, x_vec,
+                          y_vec, block_pulses, workers, tile, dtype, geometry)
+
+def interp_tile(pulses, range_axis, tile_ranges, image_tile,
+                block_pulses=BLOCK_PULSES):
+    """
+    Backproject all pulses onto a tile of rows of the image a block of pulses
+    at a time using linear interpolation.
+    """
+    num_pulses = pulses.shape[0]
+    two_way_range = np.empty((block_pulses,) + image_tile.shape,
+                             dtype=range_axis.dtype)
+    
+    # Iterate over each block of pulses
+    for first in range(0, num_pulses, block_pulses):
+        block = slice(first, first + block_pulses)
+        num_block = min(block_pulses, num_pulses - first)
+        block_range = tile_ranges(block, two_way_range)
         
-    return complex_image
+        # Interpolate each pulse's return to each range in the tile using
+        # linear interpolation; pulses are summed in order
+        for ii in range(num_block):
+            image_tile += np.interp(block_range[ii], range_axis,
+                                    pulses[first + ii, :], left=0, right=0)
+
+def interp_approach(pulses, range_axis, platform_pos, x_vec, y_vec,
+                    block_pulses=BLOCK_PULSES, workers=1, tile=None,
+                    dtype=float, geometry=None):
+    """
+    Backprojection using interpolated shifts; the image is formed a tile of
+    'tile' rows and a block of pulses at a time so that the ranges of a whole
+    block are computed at once into a scratch buffer, of about SCRATCH_BYTES
+    unless tile is given. Tiles are spread over 'workers' threads; each tile
+    sums its pulses in order so the image does not depend on the number of
+    workers. Ranges and the image are held at the precision of dtype;
+    np.float32 halves their memory traffic and returns a complex64 image.
+    A GeometryCache given as geometry saves recomputing the ranges when the
+    same track and grid are imaged again.
+    """
+    return tiled_approach(interp_tile, pulses, range_axis, platform_pos, x_vec,
+                          y_vec, block_pulses, workers, tile, dtype, geometry)
+    
+def upsample(pulses, factor):
+    """
+    Upsample pulses along fast time by an integer factor through zero-padding
+    their spectra; the Nyquist bin is kept with the negative frequencies.
+    """
+    num_samples = pulses.shape[-1]
+    num_positive = num_samples - num_samples // 2
+    spectrum = np.fft.fft(pulses, axis=-1)
+    padded_spectrum = np.zeros(pulses.shape[:-1] + (num_samples * factor,),
+                               dtype=complex)
+    padded_spectrum[..., :num_positive] = spectrum[..., :num_positive]
+    padded_spectrum[..., (num_positive - num_samples):] = \
+        spectrum[..., num_positive:]
+    return np.fft.ifft(padded_spectrum, axis=-1) * factor
+
+def fourier_tile(pulses, range_axis, tile_ranges, image_tile,
+                 block_pulses=BLOCK_PULSES, center_freq=None, sample_time=None):
+    """
+    Backproject upsampled demodulated pulses onto a tile of rows of the image
+    a block of pulses at a time; each point takes the linear interpolation of
+    the pulse at its 2-way delay remodulated to the center frequency. The last
+    sample of each pulse repeats its first so that delays wrap around.
+    """
+    (num_pulses, num_samples) = pulses.shape
+    sample_axis = np.arange(num_samples)
+    two_way_range = np.empty((block_pulses,) + image_tile.shape,
+                             dtype=range_axis.dtype)
     
+    # Iterate over each block of pulses
+    for first in range(0, num_pulses, block_pulses):
+        block = slice(first, first + block_pulses)
+        block_range = tile_ranges(block, two_way_range)
+        
+        # Calculate the 2-way time delay to each point and the sample of the
+        # upsampled pulses it falls on
+        two_way_time = block_range * (2 / SPEED_OF_LIGHT)
+        delay_samples = np.mod(two_way_time / sample_time, num_samples - 1)
+        phase = np.exp(2j * np.pi * center_freq * two_way_time)
+        
+        # Interpolate each pulse to each delay and remodulate
+        for ii in range(len(phase)):
+            image_tile += phase[ii] * np.interp(
+                    delay_samples[ii], sample_axis, pulses[first + ii, :])
+
 def fourier_approach(pulses, range_axis, platform_pos, x_vec, y_vec, 
-                     center_freq):
+                     center_freq, workers=1, tile=None,
+                     upsample_factor=UPSAMPLE_FACTOR, dtype=float,
+                     geometry=None):
+    """
+    Backprojection using shifts equivalent to linear phase ramps; pulses are
+    demodulated and upsampled once by 'upsample_factor' through the FFT and
+    then linearly interpolated to each point's delay, which approximates the
+    exact Fourier shift more closely the higher the factor. Tiles of rows are
+    spread over workers, and the image is formed at the precision of dtype
+    with ranges from the geometry cache, as in interp_approach.
+    """
+    # Compute the fast-time or range-bin times
+    range_axis = np.squeeze(range_axis)
+    fast_time = range_axis / SPEED_OF_LIGHT
+    delta_fast_time = fast_time[1] - fast_time[0]
+    
+    # Demodulate and upsample each pulse; the first sample is repeated at the
+    # end since shifts wrap around the pulse
+    demod_pulses = upsample(
+            pulses * np.exp(-1j * 2 * np.pi * center_freq * fast_time),
+            upsample_factor)
+    demod_pulses = np.concatenate((demod_pulses, demod_pulses[:, :1]), axis=1)
+    
+    return tiled_approach(
+            partial(fourier_tile, center_freq=center_freq,
+                    sample_time=delta_fast_time / upsample_factor),
+            demod_pulses, range_axis, platform_pos, x_vec, y_vec,
+            workers=workers, tile=tile, dtype=dtype, geometry=geometry)
+
+def fft_size(size):
+    """
+    Smallest power of two of at least size, for fast FFTs.
+    """
+    return 2**int(np.ceil(np.log2(max(1, size))))
+
+def analytic_signal(pulses):
+    """
+    Analytic signal of real pulses along fast time; its real part is the
+    pulses themselves. Pulses are zero-padded to a fast FFT size.
+    """
+    num_samples = pulses.shape[-1]
+    num_fft = fft_size(num_samples)
+    weights = np.zeros(num_fft)
+    weights[0] = 1
+    weights[1:num_fft // 2] = 2
+    weights[num_fft // 2] = 1
+    return np.fft.ifft(np.fft.fft(pulses, num_fft, axis=-1) * weights,
+                       axis=-1)[..., :num_samples]
+
+def carrier(pulses):
+    """
+    Carrier frequency of pulses (cycles per range bin) from the circular mean
+    of their power spectrum, the half-width of the band about it holding
+    CARRIER_POWER of their power and the largest frequency magnitude in that
+    band (both cycles per range bin). Real pulses are taken by the positive
+    frequencies of their spectrum, as their analytic signal.
+    """
+    num_fft = fft_size(pulses.shape[-1])
+    if np.iscomplexobj(pulses):
+        spectrum = np.fft.fft(pulses, num_fft, axis=-1)
+        freqs = np.fft.fftfreq(num_fft)
+    else:
+        spectrum = np.fft.rfft(pulses, num_fft, axis=-1)
+        freqs = np.fft.rfftfreq(num_fft)
+    power = np.sum(np.abs(spectrum)**2, axis=0)
+    center_freq = (np.angle(np.sum(power * np.exp(2j * np.pi * freqs))) /
+                   (2 * np.pi))
+    
+    # Widen the band about the carrier until it holds CARRIER_POWER of the power
+    offsets = np.abs((freqs - center_freq + 0.5) % 1 - 0.5)
+    order = np.argsort(offsets)
+    cumulative_power = np.cumsum(power[order])
+    num_band = np.searchsorted(cumulative_power,
+                               CARRIER_POWER * cumulative_power[-1]) + 1
+    half_width = offsets[order[num_band - 1]]
+    max_freq = np.max(np.abs(freqs[order[:num_band]]))
+    return center_freq, half_width, max_freq
+
+def cubic_weights(frac):
+    """
+    Weights of the four samples around fractional positions frac past the
+    second of them for cubic (Keys) interpolation.
+    """
+    return (((2 - frac) * frac - 1) * frac / 2,
+            ((3 * frac - 5) * frac * frac + 2) / 2,
+            ((4 - 3 * frac) * frac + 1) * frac / 2,
+            (frac - 1) * frac * frac / 2)
+
+def unit_phasor(cycles, sign=1):
+    """
+    exp(sign * 2j * pi * cycles); the phase is reduced to within half a cycle
+    at double precision and its cosine and sine evaluated at single
+    precision, which is accurate to a few parts in 10**7 and several times
+    faster than the complex exponential.
+    """
+    phase = cycles - np.round(cycles)
+    phase = phase.astype(np.float32)
+    phase *= np.float32(sign * 2 * np.pi)
+    phasor = np.empty(phase.shape, dtype=np.complex64)
+    np.cos(phase, out=phasor.real)
+    np.sin(phase, out=phasor.imag)
+    return phasor
+
+class PolarImage(object):
+    """
+    Subimage of a subaperture on a polar grid in the ground plane about the
+    subaperture's center, covering the extent (x_min, x_max, y_min, y_max) of
+    the image. Samples are stored demodulated by the carrier at their range
+    from the center so that they vary slowly enough to interpolate, at single
+    precision, with the angles wrapped one row before and two after the grid
+    so that interpolation needs no wrapping of indices; the angular spacing
+    shrinks as the subaperture grows.
+    """
+    def __init__(self, positions, extent, range_step, max_wavenumber,
+                 oversample):
+        self.center = np.mean(positions, axis=0)
+        (x_min, x_max, y_min, y_max) = extent
+        (center_x, center_y) = self.center[:2]
+        corners_x = np.array([x_min, x_max, x_max, x_min]) - center_x
+        corners_y = np.array([y_min, y_min, y_max, y_max]) - center_y
+        
+        # Ranges from the nearest to the farthest point of the image
+        self.range_step = range_step
+        min_range = np.hypot(center_x - np.clip(center_x, x_min, x_max),
+                             center_y - np.clip(center_y, y_min, y_max))
+        max_range = np.max(np.hypot(corners_x, corners_y))
+        self.first_range = max(0, min_range - range_step)
+        self.num_ranges = int(np.ceil(
+                (max_range - self.first_range) / range_step)) + 2
+        
+        # Angles spaced so that the difference in range between any position
+        # of the subaperture and its center changes by a fraction 1/oversample
+        # of a cycle of the highest wavenumber between angles
+        max_offset = np.max(np.linalg.norm(positions - self.center, axis=1))
+        if max_offset > 0:
+            angle_step = 1 / (oversample * max_wavenumber * max_offset)
+        else:
+            angle_step = np.inf
+        self.full_circle = min_range == 0
+        if self.full_circle:
+            # The center is within the image; cover the whole circle
+            self.first_angle = -np.pi
+            self.num_angles = max(4, int(np.ceil(2 * np.pi / angle_step)))
+            self.angle_step = 2 * np.pi / self.num_angles
+        else:
+            # Cover the arc spanned by the corners of the image, with the two
+            # extra angles either side that cubic interpolation needs
+            reference = np.arctan2(np.mean(corners_y), np.mean(corners_x))
+            offsets = (np.arctan2(corners_y, corners_x) - reference +
+                       np.pi) % (2 * np.pi) - np.pi
+            span = np.max(offsets) - np.min(offsets)
+            self.angle_step = min(angle_step, span)
+            self.first_angle = (reference + np.min(offsets) -
+                                2 * self.angle_step)
+            self.num_angles = int(np.ceil(span / self.angle_step)) + 5
+        
+        self.data = None
+    
+    @property
+    def size(self):
+        """
+        Number of samples of the polar grid.
+        """
+        return self.num_angles * self.num_ranges
+    
+    def ranges(self):
+        """
+        Ground ranges of the polar grid from the center.
+        """
+        return self.first_range + self.range_step * np.arange(self.num_ranges)
+    
+    def grid(self):
+        """
+        Ground positions of the samples of the polar grid; each is an array
+        of angles by ranges.
+        """
+        angles = self.first_angle + self.angle_step * np.arange(self.num_angles)
+        ranges = self.ranges()
+        x = self.center[0] + np.cos(angles)[:, np.newaxis] * ranges
+        y = self.center[1] + np.sin(angles)[:, np.newaxis] * ranges
+        return x, y
+    
+    def carrier_phase(self, ground_range, wavenumber, sign):
+        """
+        Carrier phase factor at the slant range of ground ranges from the
+        center; a sign of 1 remodulates and -1 demodulates.
+        """
+        slant_range = np.sqrt(ground_range**2 + self.center[2]**2)
+        return unit_phasor(wavenumber * slant_range, sign)
+    
+    def backproject(self, pulses, range_axis, positions, wavenumber):
+        """
+        Backproject pulses from their platform positions directly onto the
+        polar grid with linear interpolation as in interp_approach.
+        """
+        (x, y) = self.grid()
+        data = np.zeros(x.shape, dtype=complex)
+        for pulse, position in zip(pulses, positions):
+            ranges = np.sqrt((x - position[0])**2 + (y - position[1])**2 +
+                             position[2]**2)
+            data += np.interp(ranges, range_axis, pulse, left=0, right=0)
+        data *= self.carrier_phase(self.ranges(), wavenumber, -1)
+        self.store(data)
+    
+    def store(self, data):
+        """
+        Store demodulated samples of the polar grid padded with the wrapped
+        angles.
+        """
+        rows = np.arange(-1, self.num_angles + 2) % self.num_angles
+        self.data = np.take(data, rows, axis=0).astype(np.complex64)
+    
+    def sample(self, x, y, wavenumber):
+        """
+        Interpolate the subimage at ground positions and remodulate it;
+        positions off the polar grid are zero.
+        """
+        dx = x - self.center[0]
+        dy = y - self.center[1]
+        ground_range = np.sqrt(dx * dx + dy * dy)
+        range_ind = (ground_range - self.first_range) / self.range_step
+        angle_ind = (((np.arctan2(dy, dx) - self.first_angle) % (2 * np.pi)) /
+                     self.angle_step)
+        
+        # Indices and weights of the neighbouring samples; linear in range
+        # and cubic (Keys) in angle, which holds the amplitude of the
+        # fastest varying angular content far better than linear
+        range_floor = np.floor(range_ind)
+        angle_floor = np.floor(angle_ind)
+        range_weight = (range_ind - range_floor).astype(np.float32)
+        angle_weights = cubic_weights(
+                (angle_ind - angle_floor).astype(np.float32))
+        valid = (range_floor >= 0) & (range_floor < self.num_ranges - 1)
+        if not self.full_circle:
+            valid &= (angle_floor >= 1) & (angle_floor < self.num_angles - 2)
+        first_ind = angle_floor.astype(np.intp)
+        first_ind *= self.num_ranges
+        first_ind += range_floor.astype(np.intp)
+        first_ind[~valid] = 0
+        
+        # Interpolate in range along each of the four angles, padded rows
+        # starting one angle before angle_floor
+        data = self.data.ravel()
+        samples = np.zeros(ground_range.shape, dtype=np.complex64)
+        for angle_weight in angle_weights:
+            near = np.take(data, first_ind)
+            far = np.take(data, first_ind + 1)
+            far -= near
+            far *= range_weight
+            far += near
+            far *= angle_weight
+            samples += far
+            first_ind += self.num_ranges
+        samples *= self.carrier_phase(ground_range, wavenumber, 1)
+        samples[~valid] = 0
+        return samples
+    
+    def merge(self, children, wavenumber):
+        """
+        Form the subimage as the sum of the subimages of its children
+        interpolated onto its polar grid.
+        """
+        (x, y) = self.grid()
+        data = np.zeros(x.shape, dtype=np.complex64)
+        for child in children:
+            data += child.sample(x, y, wavenumber)
+        data *= self.carrier_phase(self.ranges(), wavenumber, -1)
+        self.store(data)
+
+def ffbp_approach(pulses, range_axis, platform_pos, x_vec, y_vec,
+                  leaf_pulses=LEAF_PULSES, merge_factor=MERGE_FACTOR,
+                  oversample=OVERSAMPLE, workers=1, tile=None):
     """
-    Backprojection using shifts implemented through linear phase ramps.
+    Fast factorized backprojection; pulses are split into subapertures of
+    'leaf_pulses' pulses, each backprojected onto a polar subimage about its
+    center, and every 'merge_factor' neighbouring subimages are merged into
+    the subimage of their joint subaperture up a tree. Merging stops once it
+    would cost more samples than interpolating the subimages it removes onto
+    the image, and the remaining subimages are interpolated onto the image
+    grid. The polar grids sample the demodulated subimages 'oversample' times
+    per range bin and per cycle of the highest wavenumber across the
+    subaperture; higher is closer to interp_approach and slower. Subimages,
+    and tiles of 'tile' rows of the image, are spread over 'workers' threads.
     """
+    # Ensure that the range_axis is a 1-D vector
+    range_axis = np.squeeze(range_axis)
+    
     # Determine dimensions of data
-    (num_pulses, num_range_bins) = pulses.shape
+    num_pulses = pulses.shape[0]
+    x_vec = np.asarray(x_vec)
+    y_vec = np.asarray(y_vec)
     num_x_pos = len(x_vec)
     num_y_pos = len(y_vec)
+    platform_pos = np.asarray(platform_pos)[:num_pulses]
+    if tile is None:
+        tile = max(1, SCRATCH_BYTES // (16 * num_x_pos))
     
-    # Compute the fast-time or range-bin times
-    fast_time = np.transpose(range_axis / SPEED_OF_LIGHT)
-    delta_fast_time = fast_time[1] - fast_time[0]
+    # Backproject the analytic signal of real pulses; the real part of its
+    # image is the image of the pulses
+    is_real = not np.iscomplexobj(pulses)
+    if is_real:
+        pulses = analytic_signal(pulses)
+    
+    # Carrier and highest wavenumbers of the pulses (cycles per unit range)
+    range_res = (range_axis[-1] - range_axis[0]) / (len(range_axis) - 1)
+    (center_freq, _, max_freq) = carrier(pulses)
+    wavenumber = center_freq / range_res
+    max_wavenumber = max_freq / range_res
+    range_step = range_res / oversample
+    
+    # Extent of the image covered by the polar subimages
+    x_margin = abs(x_vec[-1] - x_vec[0]) / max(1, num_x_pos - 1)
+    y_margin = abs(y_vec[-1] - y_vec[0]) / max(1, num_y_pos - 1)
+    extent = (np.min(x_vec) - x_margin, np.max(x_vec) + x_margin,
+              np.min(y_vec) - y_margin, np.max(y_vec) + y_margin)
+    
+    # Backproject each leaf subaperture onto its polar subimage
+    apertures = [slice(first, first + leaf_pulses)
+                 for first in range(0, num_pulses, leaf_pulses)]
+    subimages = [PolarImage(platform_pos[aperture], extent, range_step,
+                            max_wavenumber, oversample)
+                 for aperture in apertures]
+    map_tiles(lambda ii: subimages[ii].backproject(
+                      pulses[apertures[ii]], range_axis,
+                      platform_pos[apertures[ii]], wavenumber),
+              range(len(subimages)), workers)
+    
+    # Merge neighbouring subimages up the tree while merging costs fewer
+    # samples than interpolating the subimages it removes onto the image
+    while len(subimages) > 1:
+        groups = [slice(first, first + merge_factor)
+                  for first in range(0, len(subimages), merge_factor)]
+        parents = [PolarImage(
+                           platform_pos[apertures[group][0].start:
+                                        apertures[group][-1].stop],
+                           extent, range_step, max_wavenumber, oversample)
+                   for group in groups]
+        merge_samples = sum(parent.size * len(subimages[group])
+                            for parent, group in zip(parents, groups))
+        if merge_samples > ((len(subimages) - len(parents)) *
+                            num_x_pos * num_y_pos):
+            break
+        map_tiles(lambda ii: parents[ii].merge(subimages[groups[ii]],
+                                               wavenumber),
+                  range(len(parents)), workers)
+        apertures = [slice(apertures[group][0].start,
+                           apertures[group][-1].stop) for group in groups]
+        subimages = parents
+    
+    # Interpolate the remaining subimages onto each tile of rows of the image
+    complex_image = np.zeros((num_y_pos, num_x_pos), dtype=complex)
+    def project_tile(rows):
+        (x, y) = np.meshgrid(x_vec, y_vec[rows])
+        for subimage in subimages:
+            complex_image[rows] += subimage.sample(x, y, wavenumber)
+    map_tiles(project_tile,
+              [slice(ii, ii + tile) for ii in range(0, num_y_pos, tile)],
+              workers)
     
-    # Compute the unwrapped angular frequency
-    ang_freq = np.transpose(2 * np.pi * 
-                            np.arange(-num_range_bins / 2, num_range_bins / 2) / 
-                            (delta_fast_time * num_range_bins))
+    if is_real:
+        complex_image = complex_image.real.astype(complex)
+    return complex_image
+
+def linear_track(platform_pos):
+    """
+    Least-squares fit of platform positions moving at a constant velocity
+    along a straight line; returns the nominal positions on it.
+    """
+    platform_pos = np.asarray(platform_pos, dtype=float)
+    ind = np.arange(len(platform_pos)) - (len(platform_pos) - 1) / 2
+    center = np.mean(platform_pos, axis=0)
+    step = np.dot(ind, platform_pos - center) / max(1, np.dot(ind, ind))
+    return center + ind[:, np.newaxis] * step
+
+def track_error(platform_pos, nominal_pos, x_vec, y_vec):
+    """
+    Largest error in range at the corners of the image left by imaging from
+    nominal_pos instead of platform_pos once the change in range to the
+    center of the image has been compensated.
+    """
+    x_bounds = (np.min(x_vec), np.max(x_vec))
+    y_bounds = (np.min(y_vec), np.max(y_vec))
+    center = np.array([np.mean(x_bounds), np.mean(y_bounds), 0])
+    points = [np.array([x, y, 0]) for x in x_bounds for y in y_bounds]
+    compensation = (np.linalg.norm(platform_pos - center, axis=1) -
+                    np.linalg.norm(nominal_pos - center, axis=1))
+    return max(np.max(np.abs(np.linalg.norm(platform_pos - point, axis=1) -
+                             np.linalg.norm(nominal_pos - point, axis=1) -
+                             compensation)) for point in points)
+
+def is_linear_track(pulses, range_axis, platform_pos, x_vec, y_vec,
+                    tolerance=TRACK_TOLERANCE):
+    """
+    Whether the platform positions are close enough to a uniformly sampled
+    straight track for omega_k_approach; the range error left anywhere in the
+    image must be within 'tolerance' cycles of the highest wavenumber of the
+    pulses.
+    """
+    platform_pos = np.asarray(platform_pos, dtype=float)[:pulses.shape[0]]
+    if len(platform_pos) < 2:
+        return False
+    nominal_pos = linear_track(platform_pos)
+    if not np.any(nominal_pos[1] - nominal_pos[0]):
+        return False
+    range_axis = np.squeeze(range_axis)
+    range_res = (range_axis[-1] - range_axis[0]) / (len(range_axis) - 1)
+    max_wavenumber = carrier(pulses)[2] / range_res
+    return (track_error(platform_pos, nominal_pos, x_vec, y_vec) <=
+            tolerance / max_wavenumber)
+
+def omega_k_approach(pulses, range_axis, platform_pos, x_vec, y_vec,
+                     oversample=STOLT_OVERSAMPLE, tolerance=TRACK_TOLERANCE):
+    """
+    Frequency-domain imaging of a straight track (range migration or omega-K
+    algorithm). Positions are taken as uniformly spaced along the line fitted
+    to them, with the range change to the center of the image compensated; a
+    ValueError is raised unless is_linear_track accepts them. Pulses are
+    transformed in range and along track, resampled onto a uniform grid of
+    wavenumbers across track (Stolt mapping) and transformed back to an
+    image over distances along and from the track, which is interpolated
+    onto the image grid. Its grid and wavenumbers are oversampled
+    'oversample' times; the cost is O(N log N) in the size of the data and
+    image. Being band-limited, it matches interp_approach applied to finely
+    upsampled pulses rather than to the pulses themselves.
+    """
+    # Ensure that the range_axis is a 1-D vector
+    range_axis = np.squeeze(range_axis)
+    
+    # Determine dimensions of data
+    num_pulses = pulses.shape[0]
+    x_vec = np.asarray(x_vec)
+    y_vec = np.asarray(y_vec)
+    platform_pos = np.asarray(platform_pos, dtype=float)[:num_pulses]
     
-    # X-Y locations of image grid
-    x_grid, y_grid = np.meshgrid(x_vec, y_vec)
+    # Image the analytic signal of real pulses; the real part of its image is
+    # the image of the pulses
+    is_real = not np.iscomplexobj(pulses)
+    if is_real:
+        pulses = analytic_signal(pulses)
+    if not is_linear_track(pulses, range_axis, platform_pos, x_vec, y_vec,
+                           tolerance):
+        raise ValueError('Platform positions are not a uniformly sampled '
+                         'straight track')
     
-    # Initialize SAR image
-    complex_image = np.zeros_like(x_grid, dtype=np.complex)
+    # Band of range wavenumbers of the pulses (cycles per unit range); twice
+    # as wide as the band holding CARRIER_POWER of their power so that
+    # truncating it is negligible
+    range_res = (range_axis[-1] - range_axis[0]) / (len(range_axis) - 1)
+    (center_freq, half_width, _) = carrier(pulses)
+    min_wavenumber = max(0, center_freq - 2 * half_width) / range_res
+    max_wavenumber = min(0.5, center_freq + 2 * half_width) / range_res
     
-    # Iterate over each X-position in image grid and focus all the pixels 
-    # across the Y-span of the image grid, i.e., a column
-    for ii in range(0, num_x_pos):
-        print('%d of %d' % (ii, num_x_pos))
+    # Distance of each point of the image along the track from the first
+    # nominal position and from the track
+    nominal_pos = linear_track(platform_pos)
+    step = nominal_pos[1] - nominal_pos[0]
+    spacing = np.linalg.norm(step)
+    (x, y) = np.meshgrid(x_vec, y_vec)
+    offset = (x - nominal_pos[0, 0], y - nominal_pos[0, 1], -nominal_pos[0, 2])
+    along = sum(component * (step_component / spacing)
+                for component, step_component in zip(offset, step))
+    across = np.sqrt(np.maximum(
+            sum(component**2 for component in offset) - along**2, 0))
+    
+    # Keep only the range bins between the nearest and farthest points of
+    # the image from the track
+    track_length = spacing * (num_pulses - 1)
+    min_range = np.min(np.hypot(along - np.clip(along, 0, track_length),
+                                across))
+    max_range = np.max(np.hypot(np.maximum(along, track_length - along),
+                                across))
+    first_bin = max(0, int(np.floor((min_range - range_axis[0]) / range_res))
+                    - RANGE_MARGIN)
+    last_bin = min(len(range_axis), int(np.ceil(
+            (max_range - range_axis[0]) / range_res)) + RANGE_MARGIN + 1)
+    if first_bin >= last_bin:
+        return np.zeros(x.shape, dtype=complex)
+    num_range_bins = last_bin - first_bin
+    first_range = range_axis[first_bin]
+    center_range = first_range + range_res * num_range_bins / 2
+    
+    # Change in range to the center of the image from each nominal position
+    x_bounds = (np.min(x_vec), np.max(x_vec))
+    y_bounds = (np.min(y_vec), np.max(y_vec))
+    center = np.array([np.mean(x_bounds), np.mean(y_bounds), 0])
+    compensation = (np.linalg.norm(platform_pos - center, axis=1) -
+                    np.linalg.norm(nominal_pos - center, axis=1))
+    
+    # Transform in range a block of pulses at a time, keeping only the band
+    # of the pulses; spectra are referenced to the center of the kept bins so
+    # that they vary slowly enough to interpolate, and the change in range to
+    # the center of the image of each position is compensated
+    num_range_fft = fft_size(oversample * num_range_bins)
+    range_wavenumbers = np.fft.fftfreq(num_range_fft, range_res)
+    range_wavenumber_step = 1 / (num_range_fft * range_res)
+    band = np.flatnonzero(
+            (range_wavenumbers >= min_wavenumber - 2 * range_wavenumber_step) &
+            (range_wavenumbers <= max_wavenumber + 2 * range_wavenumber_step))
+    band = band[np.argsort(range_wavenumbers[band])]
+    range_wavenumbers = range_wavenumbers[band]
+    spectra = np.empty((num_pulses, len(band)), dtype=complex)
+    block_pulses = max(1, SCRATCH_BYTES // (16 * num_range_fft))
+    for first in range(0, num_pulses, block_pulses):
+        block = slice(first, first + block_pulses)
+        spectra[block] = np.fft.fft(pulses[block, first_bin:last_bin],
+                                    num_range_fft, axis=1)[:, band]
+        spectra[block] *= np.exp(2j * np.pi * range_wavenumbers *
+                                 (center_range - first_range +
+                                  compensation[block, np.newaxis]))
+    
+    # Transform along track a block of range wavenumbers at a time, padded so
+    # that points of the image and the track do not wrap around onto each
+    # other; only along-track wavenumbers below the highest range wavenumber
+    # propagate
+    span = (max(np.max(along), track_length) - min(np.min(along), 0))
+    num_along_fft = fft_size(2 * span / spacing + num_pulses)
+    along_wavenumbers = np.fft.fftfreq(num_along_fft, spacing)
+    rows = np.flatnonzero(np.abs(along_wavenumbers) <= max_wavenumber)
+    along_wavenumbers = along_wavenumbers[rows]
+    along_spectra = np.empty((len(rows), len(band)), dtype=complex)
+    block_wavenumbers = max(1, SCRATCH_BYTES // (16 * num_along_fft))
+    for first in range(0, len(band), block_wavenumbers):
+        block = slice(first, first + block_wavenumbers)
+        along_spectra[:, block] = np.fft.fft(spectra[:, block], num_along_fft,
+                                             axis=0)[rows]
+    
+    # Grid of wavenumbers across track, centered on the band they can take
+    # and spaced for an image over the kept ranges; the image is sampled
+    # 'oversample' times finer than the band requires
+    across_step = 1 / (oversample * max_wavenumber)
+    num_across = fft_size(range_res * num_range_bins / across_step)
+    across_ind = np.fft.fftfreq(num_across) * num_across
+    across_wavenumber_step = 1 / (num_across * across_step)
+    wavenumber = max_wavenumber / 2
+    across_wavenumbers = wavenumber + across_ind * across_wavenumber_step
+    first_across = first_range
+    
+    # Stolt mapping; resample each along-track wavenumber's spectrum at the
+    # range wavenumbers of the grid across track, weighted by the stationary
+    # phase amplitude of the sum over positions
+    stolt = np.zeros((len(rows), num_across), dtype=complex)
+    weights = np.zeros(num_across)
+    propagating = across_wavenumbers > 0
+    weights[propagating] = 1 / np.sqrt(across_wavenumbers[propagating])
+    weights = weights * np.exp(2j * np.pi * across_ind / num_across *
+                               first_across / across_step)
+    for ii, along_wavenumber in enumerate(along_wavenumbers):
+        range_wavenumber = np.hypot(across_wavenumbers, along_wavenumber)
+        stolt[ii] = np.interp(range_wavenumber, range_wavenumbers,
+                              along_spectra[ii], left=0, right=0)
+        stolt[ii] *= weights * np.exp(-2j * np.pi * range_wavenumber *
+                                      center_range)
+    
+    # Transform back to an image demodulated across track, sampled along
+    # track 'oversample' times finer than the band requires
+    num_along = fft_size(oversample * 2 * max_wavenumber * spacing *
+                         num_along_fft)
+    padded = np.zeros((num_along, num_across), dtype=complex)
+    padded[np.fft.fftfreq(num_along_fft, 1 / num_along_fft)[rows]
+           .astype(np.intp)] = stolt
+    baseband = np.fft.ifft2(padded) * (num_along * num_across)
+    along_step = num_along_fft * spacing / num_along
+    
+    # Interpolate onto the image grid; both axes of the baseband image are
+    # periodic
+    along_ind = along / along_step
+    across_ind = (across - first_across) / across_step
+    along_floor = np.floor(along_ind)
+    across_floor = np.floor(across_ind)
+    along_weights = cubic_weights(along_ind - along_floor)
+    across_weights = cubic_weights(across_ind - across_floor)
+    along_floor = along_floor.astype(np.intp)
+    across_floor = across_floor.astype(np.intp)
+    baseband = baseband.ravel()
+    complex_image = np.zeros(x.shape, dtype=complex)
+    for along_offset, along_weight in zip(range(-1, 3), along_weights):
+        row_start = (along_floor + along_offset) % num_along * num_across
+        for across_offset, across_weight in zip(range(-1, 3), across_weights):
+            ind = row_start + (across_floor + across_offset) % num_across
+            complex_image += along_weight * across_weight * baseband[ind]
+    
+    # Remodulate and scale as the sum over pulses of interp_approach
+    complex_image *= (np.sqrt(across) *
+                      np.exp(2j * np.pi * wavenumber * across + 0.25j * np.pi) *
+                      across_wavenumber_step / range_wavenumber_step /
+                      (num_range_fft * num_along_fft * spacing))
+    
+    if is_real:
+        complex_image = complex_image.real.astype(complex)
+    return complex_image
+
+def progressive_approach(pulses, range_axis, platform_pos, x_vec, y_vec,
+                         callback=None, approach=interp_approach,
+                         tile=REFINE_TILE, **kwargs):
+    """
+    Backprojection refined from coarse to fine; a first frame is formed from
+    every d-th pixel and pulse, where d is a power of two that leaves about
+    COARSE_PIXELS pixels (and at least COARSE_PULSES pulses), and d is then
+    halved at each level until the image is at full resolution. Each level
+    refines square tiles of 'tile' pixels in order of decreasing energy in
+    the previous level, and callback is called with the image after the
+    first frame and after each tile; unrefined pixels repeat the nearest
+    pixel of the previous level. The callback gets the image being formed,
+    which it must copy to keep. The final image is that of approach, which
+    is called with kwargs.
+    """
+    (num_y_pos, num_x_pos) = (len(y_vec), len(x_vec))
+    num_pulses = pulses.shape[0]
+    x_vec = np.asarray(x_vec)
+    y_vec = np.asarray(y_vec)
+    platform_pos = np.asarray(platform_pos)
+    
+    # Choose the decimation of the first frame; tiles are a multiple of it so
+    # that every tile starts on a pixel of every level
+    decimation = 1
+    while (num_x_pos * num_y_pos > COARSE_PIXELS * decimation**2 and
+           num_pulses >= COARSE_PULSES * decimation * 2):
+        decimation *= 2
+    tile = max(tile, decimation)
+    tile = decimation * -(-tile // decimation)
+    
+    # Small images are formed directly
+    if decimation == 1:
+        image = approach(pulses, range_axis, platform_pos, x_vec, y_vec,
+                         **kwargs)
+        if callback is not None:
+            callback(image)
+        return image
+    
+    # Image the grid of every d-th pixel of a tile from every d-th pulse;
+    # the tile is scaled to keep the brightness of the full image
+    def image_tile(rows, cols, decimation):
+        tile_image = approach(pulses[::decimation], range_axis,
+                              platform_pos[:num_pulses:decimation],
+                              x_vec[cols][::decimation],
+                              y_vec[rows][::decimation], **kwargs)
+        if decimation > 1:
+            tile_image = np.repeat(np.repeat(tile_image * decimation,
+                                             decimation, axis=0),
+                                   decimation, axis=1)
+        image[rows, cols] = tile_image[:(rows.stop - rows.start),
+                                       :(cols.stop - cols.start)]
+    
+    # Form the first frame
+    image = np.zeros((num_y_pos, num_x_pos),
+                     dtype=complex_dtype(kwargs.get('dtype', float)))
+    image_tile(slice(0, num_y_pos), slice(0, num_x_pos), decimation)
+    if callback is not None:
+        callback(image)
+    tiles = [(slice(ii, min(ii + tile, num_y_pos)),
+              slice(jj, min(jj + tile, num_x_pos)))
+             for ii in range(0, num_y_pos, tile)
+             for jj in range(0, num_x_pos, tile)]
+    
+    # Refine tiles of the brightest parts of the image first at each level
+    while decimation > 1:
+        decimation //= 2
+        energy = [np.sum(np.abs(image[rows, cols])**2)
+                  for (rows, cols) in tiles]
+        for index in np.argsort(energy)[::-1]:
+            (rows, cols) = tiles[index]
+            image_tile(rows, cols, decimation)
+            if callback is not None:
+                callback(image)
         
-        # Initialize current column's sum of aligned pulses
-        sum_aligned_pulses = np.zeros(num_y_pos, dtype=np.complex)
+    return image
+
+def auto_approach(pulses, range_axis, platform_pos, x_vec, y_vec, workers=1,
+                  tile=None, dtype=float, geometry=None):
+    """
+    Image with omega_k_approach when is_linear_track accepts the platform
+    positions and with interp_approach, using the geometry cache if given,
+    otherwise; the image is returned at the precision of dtype.
+    """
+    if is_linear_track(pulses, range_axis, platform_pos, x_vec, y_vec):
+        return omega_k_approach(pulses, range_axis, platform_pos, x_vec,
+                                y_vec).astype(complex_dtype(dtype))
+    return interp_approach(pulses, range_axis, platform_pos, x_vec, y_vec,
+                           workers=workers, tile=tile, dtype=dtype,
+                           geometry=geometry)
+
+class ApertureImage(object):
+    """
+    Image of a window of pulses that is updated as the window moves; pulses
+    entering the window are backprojected and added and pulses leaving it
+    are backprojected and subtracted, so moving the window costs only the
+    pulses that changed. approach is any backprojector linear in the pulses
+    and is called with kwargs; a window that changed by as many pulses as it
+    holds is formed afresh, using the geometry cache if given, or through
+    progressive_approach if a callback for its frames is given. Pulses whose
+    valid flag is False are skipped. The image is accumulated in double
+    precision so that repeated updates do not drift.
+    """
+    def __init__(self, pulses, range_axis, platform_pos, x_vec, y_vec,
+                 approach=interp_approach, valid=None, geometry=None,
+                 **kwargs):
+        self.pulses = pulses
+        self.range_axis = range_axis
+        self.platform_pos = np.asarray(platform_pos)
+        self.x_vec = x_vec
+        self.y_vec = y_vec
+        self.approach = approach
+        self.valid = None if valid is None else np.asarray(valid, dtype=bool)
+        self.geometry = geometry
+        self.kwargs = kwargs
+        self.start = 0
+        self.stop = 0
+        self.image = np.zeros((len(y_vec), len(x_vec)), dtype=complex)
+        self.num_backprojected = 0
         
-        # Iterate over each pulse
-        for jj in range(0, num_pulses):
-            
-            # Calculate the 2-way time delay to each point in the current 
-            # column of the image grid
-            two_way_time = 2 * np.sqrt(
-                    (x_grid[:, ii] - platform_pos[jj, 0])**2 + 
-                    (y_grid[:, ii] - platform_pos[jj, 1])**2 +
-                    platform_pos[jj, 2]**2) / SPEED_OF_LIGHT
-                    
-            # Demodulate the current pulse
-            demod_pulse = (np.transpose(np.atleast_2d(pulses[jj, :])) * 
-                           np.exp(-1j * 2 * np.pi * center_freq * 
-                                  (fast_time - two_way_time)))
-            
-            # Align the current pulses contribution to current column
-            demod_pulse_freq = np.fft.fftshift(np.fft.fft(demod_pulse, axis=0),
-                                               axes=0)
-            phase_shift = np.exp(1j * np.outer(ang_freq, two_way_time))
-            demod_pulse_freq_aligned = phase_shift * demod_pulse_freq
-            pulse_aligned = np.fft.ifft(
-                    np.fft.ifftshift(demod_pulse_freq_aligned, 0), axis=0)
-            
-            # Update current column's sum of aligned pulses
-            sum_aligned_pulses += np.transpose(pulse_aligned[0])
+    def backproject(self, start, stop, callback=None, **kwargs):
+        """
+        Image of the valid pulses from start to stop; formed progressively if
+        a callback is given.
+        """
+        indices = np.arange(start, stop)
+        if self.valid is not None:
+            indices = indices[self.valid[start:stop]]
+        if len(indices) == 0:
+            return 0
+        self.num_backprojected += len(indices)
+        kwargs.update(self.kwargs)
+        if callback is not None:
+            return progressive_approach(
+                    self.pulses[indices], self.range_axis,
+                    self.platform_pos[indices], self.x_vec, self.y_vec,
+                    callback, self.approach, **kwargs)
+        return self.approach(self.pulses[indices], self.range_axis,
+                             self.platform_pos[indices], self.x_vec,
+                             self.y_vec, **kwargs)
+        
+    def window(self, start, stop, callback=None):
+        """
+        Image of the window of pulses from start to stop, at the precision of
+        the dtype given to the approach; callback is passed the frames of a
+        window formed afresh.
+        """
+        (start, stop, _) = slice(start, stop).indices(len(self.pulses))
+        stop = max(start, stop)
+        overlap = max(0, min(stop, self.stop) - max(start, self.start))
+        num_changed = (stop - start) + (self.stop - self.start) - 2 * overlap
+        
+        # Form the window afresh if updating would cost as much
+        if num_changed >= stop - start:
+            kwargs = dict()
+            if self.geometry is not None and callback is None:
+                kwargs['geometry'] = self.geometry
+            self.image = np.zeros(self.image.shape, dtype=complex)
+            self.image += self.backproject(start, stop, callback, **kwargs)
             
-        # Update complex image with latest column's result
-        complex_image[:, ii] = sum_aligned_pulses
+        # Otherwise add pulses entering the window and subtract those leaving
+        # it at either end
+        else:
+            if start < self.start:
+                self.image += self.backproject(start, self.start)
+            elif start > self.start:
+                self.image -= self.backproject(self.start, start)
+            if stop > self.stop:
+                self.image += self.backproject(self.stop, stop)
+            elif stop < self.stop:
+                self.image -= self.backproject(stop, self.stop)
+        (self.start, self.stop) = (start, stop)
         
-    return complex_image
+        return self.image.astype(complex_dtype(self.kwargs.get('dtype', float)))
+
+def precision_error(reference, complex_image):
+    """
+    Error of an image against a reference image of the same grid, e.g. of
+    single against double precision; returns the relative RMS error, the
+    peak error relative to the peak of the reference (dB) and the largest
+    error of the magnitude (dB) over points within DYNAMIC_RANGE of the peak.
+    """
+    error = np.abs(complex_image.astype(reference.dtype) - reference)
+    magnitude = np.abs(reference)
+    rms_error = np.linalg.norm(error) / np.linalg.norm(magnitude)
+    peak_error = 20 * np.log10(np.max(error) / np.max(magnitude))
+    shown = magnitude >= np.max(magnitude) * 10**(-DYNAMIC_RANGE / 20)
+    magnitude_error = np.max(np.abs(20 * np.log10(
+            np.abs(complex_image[shown]) / magnitude[shown])))
+    return rms_error, peak_error, magnitude_error
 
 def parse_args(args):
     """
@@ -132,14 +1057,32 @@ def parse_args(args):
     parser.add_argument('-o', '--output', nargs='?', const=None, default=None, 
                         type=str, help='File to store SAR image to')
     parser.add_argument('-m', '--method', nargs='?', type=str,
-                        choices=('shift', 'interp', 'fourier'),
+                        choices=('shift', 'interp', 'fourier', 'ffbp',
+                                 'omegak', 'auto'),
                         default='fourier', const='fourier', 
                         help='Backprojection method to use')
     parser.add_argument('-fc', '--center_freq', type=float, 
                         help=('Center frequency (Hz) of radar; must be '
                               'specified if using fourier method'))
+    parser.add_argument('-u', '--upsample', type=int, default=UPSAMPLE_FACTOR,
+                        help=('Upsampling factor of pulses for fourier method; '
+                              'higher is more accurate'))
+    parser.add_argument('-s', '--oversample', type=float, default=None,
+                        help=('Oversampling of polar subimages for ffbp method '
+                              'or of the image for omegak method; higher is '
+                              'more accurate and slower'))
     parser.add_argument('-nv', '--no_visualize', action='store_true', 
                         help='Do not show SAR image')
+    parser.add_argument('-j', '--jobs', dest='workers', type=int, default=None,
+                        help='Number of workers; defaults to CPU count')
+    parser.add_argument('-t', '--tile', type=int, default=None,
+                        help='Number of image rows per worker task')
+    parser.add_argument('-d', '--dtype', choices=('float64', 'float32'),
+                        default='float64',
+                        help='Precision of ranges, interpolation and the image')
+    parser.add_argument('-r', '--report', action='store_true',
+                        help=('Report the error of the image against the '
+                              'float64 image'))
     parsed_args = parser.parse_args(args)
     
     # Do some additional checks
@@ -169,19 +1112,56 @@ def main(args):
     y_vec = np.arange(parsed_args.y_bounds[0], parsed_args.y_bounds[1], 
                       parsed_args.pixel_res)
     
-    # Form SAR image
-    if parsed_args.method == 'shift':
-        complex_image = shift_approach(
-                pulses, range_axis, platform_pos, x_vec, y_vec)
-    elif parsed_args.method == 'interp':
-        complex_image = interp_approach(
-                pulses, range_axis, platform_pos, x_vec, y_vec)
-    elif parsed_args.method == 'fourier':
-        complex_image = fourier_approach(
-                pulses, range_axis, platform_pos, x_vec, y_vec, 
-                parsed_args.center_freq)
-    else:
-        raise ValueError('Unknown method %s specified' % parsed_args.method)    
+    # Form SAR image at the requested precision, timing it
+    def form_image(dtype):
+        if parsed_args.method == 'shift':
+            return shift_approach(
+                    pulses, range_axis, platform_pos, x_vec, y_vec,
+                    workers=parsed_args.workers, tile=parsed_args.tile,
+                    dtype=dtype)
+        elif parsed_args.method == 'interp':
+            return interp_approach(
+                    pulses, range_axis, platform_pos, x_vec, y_vec,
+                    workers=parsed_args.workers, tile=parsed_args.tile,
+                    dtype=dtype)
+        elif parsed_args.method == 'fourier':
+            return fourier_approach(
+                    pulses, range_axis, platform_pos, x_vec, y_vec, 
+                    parsed_args.center_freq, parsed_args.workers,
+                    parsed_args.tile, parsed_args.upsample, dtype)
+        elif parsed_args.method == 'ffbp':
+            return ffbp_approach(
+                    pulses, range_axis, platform_pos, x_vec, y_vec,
+                    oversample=parsed_args.oversample or OVERSAMPLE,
+                    workers=parsed_args.workers,
+                    tile=parsed_args.tile).astype(complex_dtype(dtype))
+        elif parsed_args.method == 'omegak':
+            return omega_k_approach(
+                    pulses, range_axis, platform_pos, x_vec, y_vec,
+                    oversample=parsed_args.oversample or STOLT_OVERSAMPLE
+                    ).astype(complex_dtype(dtype))
+        elif parsed_args.method == 'auto':
+            return auto_approach(
+                    pulses, range_axis, platform_pos, x_vec, y_vec,
+                    workers=parsed_args.workers, tile=parsed_args.tile,
+                    dtype=dtype)
+        raise ValueError('Unknown method %s specified' % parsed_args.method)
+    start = time.time()
+    complex_image = form_image(parsed_args.dtype)
+    elapsed = time.time() - start
+    
+    # Report the error against the double precision image
+    if parsed_args.report:
+        start = time.time()
+        reference = form_image(np.float64)
+        reference_elapsed = time.time() - start
+        (rms_error, peak_error, magnitude_error) = precision_error(
+                reference, complex_image)
+        print('%s image in %.2f s; float64 in %.2f s' %
+              (parsed_args.dtype, elapsed, reference_elapsed))
+        print('Relative RMS error %.3g, peak error %.1f dB, magnitude error '
+              '%.3g dB within %d dB of the peak' %
+              (rms_error, peak_error, magnitude_error, DYNAMIC_RANGE))
         
     # Convert to magnitude image for visualization
     image = np.abs(complex_image)
@@ -201,7 +1181,7 @@ def main(args):
         plt.show()
         
     # Save image
-    imsave(parsed_args.output, image)
+    imsave(parsed_args.output, image, cmap='gray')
     
 if __name__ == "__main__":
     """
@@ -1,5 +1,8 @@
-from pulson440_unpack import unpack
-from backprojection import interp_approach
+from pulson440_cache import cached_unpack
+from backprojection import ApertureImage
+from backprojection_cache import GeometryCache
+from focus_metrics import entropy
+from autofocus import Autofocus
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas
@@ -10,7 +13,7 @@ from matplotlib.figure import Figure
 
 class Script:
     def __init__(self, param1, param2, param3):
-        self.radar_data = unpack(param1)
+        self.radar_data = cached_unpack(param1)
         self.platform_position_data = param2
         self.given_object = param3
         self.meters = 0
@@ -19,6 +22,16 @@ class Script:
         self.eyeballing_end_time = 0
         self.time_offset = 0.0
         self.range_offset = 0.0
+        self.workers = None #backprojection threads; None uses every core
+        self.dtype = np.float64 #image precision; np.float32 halves memory
+        self.geometry = GeometryCache() #ranges kept between images of the same track
+        self.aperture = None #image of the current eyeballing window
+        self.aperture_key = None
+        self.autofocus_workers = None #autofocus processes; None uses every core
+        self.entropy_curve = None #(time shifts, entropies) of the last testEntropy
+        self.autofocus_optimize = True #golden-section search after the sweep; False keeps the plain sweep
+        self.autofocus_time_deviation = 0.5 #time offsets searched either side of the current one (s)
+        self.autofocus_range_deviation = 0.5 #range offsets searched either side of the current one (m)
         
 
     def extract_platform_position(self):
@@ -199,7 +212,6 @@ class Script:
         scan_data = self.radar_data['scan_data']
         range_bins = self.radar_data['range_bins']
     
-        scan_data = np.array(scan_data).astype(float)
         #optional rcs need button for this 
         '''
         for elements in range(len(scan_data)):
@@ -244,71 +256,70 @@ class Script:
     
         x_vec = np.linspace(-self.meters,self.meters,size)
         y_vec = np.linspace(-self.meters,self.meters,size)
-        scan_data_final = scan_data[self.eyeballing_start_time:self.eyeballing_end_time,:]
-        interp_plat_pos_final = interp_plat_pos[self.eyeballing_start_time:self.eyeballing_end_time,:]
         x_vec_new = x_vec+center[1]
         y_vec_new = y_vec+center[2]
-        sar_image = interp_approach(scan_data_final, range_bins-self.range_offset, interp_plat_pos_final, x_vec_new, y_vec_new)
+        sar_image = self.get_window_image(time_offset, size, interp_plat_pos, x_vec_new, y_vec_new)
         #plt.figure()
         #plt.imshow((np.abs(sar_image)),extent=[x_vec_new[0], x_vec_new[-1], y_vec_new[-1], y_vec_new[0]],aspect = 'auto')
         return sar_image
     
+    def get_window_image(self, time_offset, size, interp_plat_pos, x_vec_new, y_vec_new, callback=None):
+        #moving the eyeballing lines only backprojects the pulses that entered or left the window
+        key = (time_offset, self.range_offset, self.meters, size, self.dtype)
+        if self.aperture_key != key:
+            self.aperture = ApertureImage(self.radar_data['scan_data'], self.radar_data['range_bins']-self.range_offset, interp_plat_pos, x_vec_new, y_vec_new, valid=self.radar_data.get('valid'), geometry=self.geometry, workers=self.workers, dtype=self.dtype)
+            self.aperture_key = key
+        return self.aperture.window(self.eyeballing_start_time, self.eyeballing_end_time, callback)
+    
     def get_time_offset(self):
         return self.time_offset
     
     def get_entropy(self, magnitude_array):
-        entropy_sum = 0
-        minMag = magnitude_array[0][0] 
-        maxMag = magnitude_array[0][0]
-        for yy in range(len(magnitude_array)):
-            for xx in range(len(magnitude_array[yy])):
-                curr_mag = magnitude_array[yy][xx]
-                #print("max: " + str(maxMag) + "----- min: " + str(minMag))
-                if curr_mag > maxMag:
-                    maxMag = curr_mag
-                if curr_mag < minMag:
-                    minMag = curr_mag
-        
-        magDiff = np.abs(maxMag - minMag)
-        #print("magDiff = " + str(magDiff))
-        for yy in range(len(magnitude_array)):
-            for xx in range(len(magnitude_array[yy])):
-                curr_mag_final = np.abs(magnitude_array[yy][xx] - minMag)/magDiff
-                if (curr_mag_final != 0):
-                    #print("currMagFinal: " + str(curr_mag_final))
-                    entropy_sum += curr_mag_final*np.log2(curr_mag_final)
-        return -1*entropy_sum
+        return entropy(magnitude_array)
     
-    def testEntropy(self, deviation, step, resolution):
-        entropyArr = list()
-        combineArr = self.get_image_array(0, resolution)
-        entropyArr.append(self.get_entropy(np.abs(combineArr)))
-        counter = 0
-        for ii in np.arange(-deviation, deviation, step):
-            print(str(counter) + "/" + str(len(np.arange(-deviation, deviation, step))))
-            combineArr = self.get_image_array(ii, resolution)
-            entropyArr.append(self.get_entropy(np.abs(combineArr)))
-            counter = counter + 1
-        
-        bestIndex = 0
-        bestEntropy = entropyArr[0]
-        for ii in range(len(entropyArr)):
-            if entropyArr[ii] < bestEntropy:
-                bestIndex = ii
-                bestEntropy = entropyArr[ii]
-                print("(index, entropy): (" + str(ii) + ", " + str(entropyArr[ii]) + ")")
-            
+    def get_autofocus(self, size, metric='entropy', patch=None):
+        #radar and motion capture data are read once and shared by every candidate image; patch is the half width of the patch about the reference reflector to image (m), None images the whole grid
+        window = slice(self.eyeballing_start_time, self.eyeballing_end_time)
+        time_stamps = self.radar_data['time_stamp']
+        radar_times = ((time_stamps-time_stamps[0])/1000)[window]
+        scan_data = self.radar_data['scan_data'][window]
+        if 'valid' in self.radar_data:
+            valid = np.asarray(self.radar_data['valid'][window])
+            radar_times = radar_times[valid]
+            scan_data = scan_data[valid]
+        motion_times = self.extract_time_stamp()
+        motion_pos = self.linear_interp_nan(motion_times, self.extract_platform_position())[1]
+        center = self.extract_given_object()
+        x_vec = np.linspace(-self.meters,self.meters,size)+center[1]
+        y_vec = np.linspace(-self.meters,self.meters,size)+center[2]
+        autofocus = Autofocus(scan_data, self.radar_data['range_bins']-self.range_offset, radar_times, motion_times, motion_pos, x_vec, y_vec, metric, workers=self.workers, dtype=self.dtype)
+        
+        #only the patch about the reference reflector is imaged for each candidate
+        if patch:
+            autofocus = autofocus.patch((center[1], center[2]), patch)
+        return autofocus
+    
+    def testEntropy(self, deviation, step, resolution, tolerance=0.001):
+        #sweep coarse images of every step, then narrow the best to within tolerance
+        if self.autofocus_optimize:
+            bestShift, numImages = self.get_autofocus(resolution).optimize(self.get_time_offset()-deviation, self.get_time_offset()+deviation, step, tolerance, self.autofocus_workers)
+            bestShift = bestShift - self.get_time_offset()
+            print("Search cost " + str(numImages) + " images of " + str(resolution) + " pixels")
+            print("BEST TIME SHIFT VALUE: " + str(bestShift))
+            return bestShift
+        
+        #candidate shifts are imaged in parallel; the curve is kept in entropy_curve
+        shifts = np.concatenate(([0], np.arange(-deviation, deviation, step)))
+        print("Testing " + str(len(shifts)) + " time shifts")
+        entropyArr, bestOffset = self.get_autofocus(resolution).sweep(self.get_time_offset() + shifts, self.autofocus_workers)
+        self.entropy_curve = (shifts, entropyArr)
+        
+        bestIndex = int(np.argmin(entropyArr))
+        bestEntropy = entropyArr[bestIndex]
         print("BEST (index, entropy): (" + str(bestIndex) + ", " + str(bestEntropy) + ")")
-        if bestIndex != 0:
-            print("BEST TIME SHIFT VALUE: " + str(-deviation+(bestIndex*step)))
-        else:
-            print("BEST TIME SHIFT VALUE: 0")
-        
-        finalShift = 0
-        if bestIndex != 0:
-            finalShift = -deviation+(bestIndex*step)
+        print("BEST TIME SHIFT VALUE: " + str(shifts[bestIndex]))
         
-        return finalShift
+        return shifts[bestIndex]
     
     def main_entropy(self, param4, param5, param6, param7, param8, param9):
         self.meters = param4
@@ -325,8 +336,29 @@ class Script:
         img = ax.imshow(np.absolute(self.get_image_array(shift_test, 500)))
         return (f, ax, img)
     
+    def main_autofocus(self, param4, param5, param6, param7, param8, param9, patch=None):
+        self.meters = param4
+        self.size = param5
+        self.eyeballing_start_time = param6
+        self.eyeballing_end_time = param7
+        self.time_offset = param8
+        self.range_offset = param9
+        
+        #search time and range offsets together; range offsets are relative to the current one
+        time_deviation = self.autofocus_time_deviation
+        range_deviation = self.autofocus_range_deviation
+        time_offset, range_shift, numImages = self.get_autofocus(self.size, patch=patch).optimize_2d(self.time_offset-time_deviation, self.time_offset+time_deviation, -range_deviation, range_deviation, workers=self.autofocus_workers)
+        print("Search cost " + str(numImages) + " images of " + str(self.size) + " pixels" + ("" if patch is None else " across a patch of " + str(patch) + " meters"))
+        print("BEST (time offset, range offset): (" + str(time_offset) + ", " + str(self.range_offset + range_shift) + ")")
+        self.time_offset = time_offset
+        self.range_offset = self.range_offset + range_shift
         
-    def main_func(self, param4, param5, param6, param7, param8, param9):
+        f = Figure(figsize=(5, 5), dpi=100)
+        ax = f.add_subplot(111)
+        img = ax.imshow(np.absolute(self.get_image_array(0, self.size)))
+        return (self.time_offset, self.range_offset, f, ax, img)
+        
+    def main_func(self, param4, param5, param6, param7, param8, param9, callback=None):
         
         self.meters = param4
         self.size = param5
@@ -339,7 +371,6 @@ class Script:
         scan_data = self.radar_data['scan_data']
         range_bins = self.radar_data['range_bins']
         
-        scan_data = np.array(scan_data).astype(float)
         #optional rcs need button for this 
         '''
         for elements in range(len(scan_data)):
@@ -384,12 +415,24 @@ class Script:
         
         x_vec = np.linspace(-self.meters,self.meters,self.size)
         y_vec = np.linspace(-self.meters,self.meters,self.size)
-        scan_data_final = scan_data[self.eyeballing_start_time:self.eyeballing_end_time,:]
-        interp_plat_pos_final = interp_plat_pos[self.eyeballing_start_time:self.eyeballing_end_time,:]
         x_vec_new = x_vec+center[1]
         y_vec_new = y_vec+center[2]
-        sar_image = interp_approach(scan_data_final, range_bins-self.range_offset, interp_plat_pos_final, x_vec_new, y_vec_new)
         f = Figure(figsize=(5, 5), dpi=100)
         ax = f.add_subplot(111)
-        img = ax.imshow(20*np.log10((np.abs(sar_image))),extent=[x_vec_new[0], x_vec_new[-1], y_vec_new[-1], y_vec_new[0]],aspect = 'auto')
+        img = None
+        
+        #show coarse frames while the image is refined, if asked
+        def show_frame(frame):
+            nonlocal img
+            if img is None:
+                img = ax.imshow(20*np.log10((np.abs(frame))),extent=[x_vec_new[0], x_vec_new[-1], y_vec_new[-1], y_vec_new[0]],aspect = 'auto')
+            else:
+                img.set_data(20*np.log10((np.abs(frame))))
+            callback(f, ax, img)
+        sar_image = self.get_window_image(self.time_offset, self.size, interp_plat_pos, x_vec_new, y_vec_new, show_frame if callback is not None else None)
+        if img is None:
+            img = ax.imshow(20*np.log10((np.abs(sar_image))),extent=[x_vec_new[0], x_vec_new[-1], y_vec_new[-1], y_vec_new[0]],aspect = 'auto')
+        else:
+            img.set_data(20*np.log10((np.abs(sar_image))))
+            img.autoscale()
         return (f, ax, img)
\ No newline at end of file
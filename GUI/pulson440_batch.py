@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+PulsON 440 batch radar data unpacker
+"""
+
+# Import the required modules
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pulson440_unpack import unpack, save_data
+from pulson440_cache import cached_unpack
+
+def find_files(patterns):
+    """
+    Expand glob patterns and directories into a sorted list of data files;
+    memory-map caches and partially written outputs are skipped.
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        for file in glob.glob(pattern):
+            if os.path.isfile(file) and not file.endswith(('.mmap', '.tmp')):
+                files.add(file)
+    return sorted(files)
+
+def unpack_file(file, output_dir=None, legacy=None):
+    """
+    Unpack a single file into the unpacked data format in output_dir, or into
+    the unpack cache if no output directory is given; returns the number of
+    bytes unpacked and the time taken (s).
+    """
+    start = time.time()
+    if output_dir is None:
+        cached_unpack(file, legacy)
+    else:
+        data = unpack(file, legacy)
+        save_data(data, os.path.join(output_dir, os.path.basename(file)))
+    return os.path.getsize(file), time.time() - start
+
+def unpack_files(files, output_dir=None, legacy=None, workers=None):
+    """
+    Unpack files across a pool of worker processes; failures are reported and
+    skipped. Returns a dictionary of (number of bytes, time taken) per
+    successfully unpacked file.
+    """
+    if output_dir is not None and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    results = dict()
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = dict((executor.submit(unpack_file, file, output_dir, legacy),
+                        file) for file in files)
+        for future in as_completed(futures):
+            file = futures[future]
+            try:
+                num_bytes, elapsed = future.result()
+            except Exception as e:
+                print('%s: FAILED (%s)' % (file, e))
+                continue
+            results[file] = (num_bytes, elapsed)
+            print('%s: %.1f MB in %.2f s (%.1f MB/s)' %
+                  (file, num_bytes / 1e6, elapsed,
+                   num_bytes / 1e6 / max(elapsed, 1e-9)))
+
+    # Summarize overall throughput
+    elapsed = time.time() - start
+    total_bytes = sum(num_bytes for num_bytes, _ in results.values())
+    print('Unpacked %d of %d files; %.1f MB in %.2f s (%.1f MB/s)' %
+          (len(results), len(files), total_bytes / 1e6, elapsed,
+           total_bytes / 1e6 / max(elapsed, 1e-9)))
+
+    return results
+
+def parse_args(args):
+    """
+    Input argument parser.
+    """
+    parser = argparse.ArgumentParser(
+            description='PulsON 440 batch radar data unpacker')
+    parser.add_argument('inputs', nargs='+',
+                        help='PulsON 440 data files; glob patterns or directories')
+    parser.add_argument('-o', '--output', dest='output', default=None,
+                        help=('Output directory; defaults to adding the files '
+                              'to the unpack cache'))
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=None,
+                        help='Number of worker processes; defaults to CPU count')
+    parser.add_argument('-l', '--legacy', action='store_const', const=True,
+                        default=None, dest='legacy',
+                        help=('Load legacy format of files; detected '
+                              'automatically by default'))
+
+    return parser.parse_args(args)
+
+def main(args):
+    """
+    Top-level function; parses input arguments and unpacks all the files.
+    """
+    args = parse_args(args)
+
+    files = find_files(args.inputs)
+    return unpack_files(files, args.output, args.legacy, args.jobs)
+
+if __name__ == "__main__":
+    """
+    Standard Python alias for command line execution.
+    """
+    main(sys.argv[1:])
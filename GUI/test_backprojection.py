@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of the backprojection approaches against interp_approach on the
+mandrill capture
+"""
+
+# Import the required modules
+import os
+import pickle
+import numpy as np
+import backprojection as bp
+
+# Test settings
+MANDRILL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'mandrill_no_aliasing_data.pkl')
+SCENE_SIZE = 2.5 # Half width of the mandrill scene (m)
+GRID_SIZE = 250 # Pixels across the image grid
+FFBP_TOLERANCE = 0.05 # Largest error of ffbp_approach at default settings
+
+def load_mandrill():
+    """
+    Platform positions, pulses and range axis of the mandrill capture.
+    """
+    with open(MANDRILL_FILE, 'rb') as f:
+        (platform_pos, pulses, range_axis) = pickle.load(f)
+    return np.asarray(platform_pos), pulses, np.squeeze(range_axis)
+
+def relative_error(image, reference):
+    """
+    Norm of the difference of two images relative to that of the reference.
+    """
+    return np.linalg.norm(image - reference) / np.linalg.norm(reference)
+
+def test_ffbp_matches_interp_on_mandrill():
+    """
+    ffbp_approach is within FFBP_TOLERANCE of interp_approach at its default
+    settings, and closer the higher the oversampling.
+    """
+    (platform_pos, pulses, range_axis) = load_mandrill()
+    x_vec = np.linspace(-SCENE_SIZE, SCENE_SIZE, GRID_SIZE)
+    y_vec = np.linspace(-SCENE_SIZE, SCENE_SIZE, GRID_SIZE)
+    reference = bp.interp_approach(pulses, range_axis, platform_pos, x_vec,
+                                   y_vec)
+
+    image = bp.ffbp_approach(pulses, range_axis, platform_pos, x_vec, y_vec)
+    assert relative_error(image, reference) < FFBP_TOLERANCE
+
+    errors = [relative_error(bp.ffbp_approach(pulses, range_axis,
+                                              platform_pos, x_vec, y_vec,
+                                              oversample=oversample),
+                             reference)
+              for oversample in (2, 4, 8)]
+    assert errors[0] > errors[1] > errors[2]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of the geometry cache at the GUI's image sizes
+"""
+
+# Import the required modules
+import numpy as np
+from backprojection_cache import GeometryCache, range_grid
+
+# Test settings
+GUI_PULSES = 600 # Pulses in a typical GUI image
+GUI_GRID = 500 # Pixels across the GUI's image grid
+RANGE_TOLERANCE = 1e-5 # Largest error of cached ranges (m)
+
+def test_gui_geometry_is_cached():
+    """
+    The ranges of a GUI-sized image fit the default cache budget, are served
+    again for the same track and agree with ranges at double precision.
+    """
+    platform_pos = np.stack([np.linspace(-4, 4, GUI_PULSES),
+                             np.full(GUI_PULSES, -15.0),
+                             np.full(GUI_PULSES, 1.0)], axis=1)
+    x_vec = np.linspace(-5, 5, GUI_GRID)
+    y_vec = np.linspace(-5, 5, GUI_GRID)
+    geometry = GeometryCache()
+
+    ranges = geometry.ranges(platform_pos, x_vec, y_vec)
+    assert ranges is not None
+    assert geometry.ranges(platform_pos, x_vec, y_vec) is ranges
+    assert (geometry.hits, geometry.misses) == (1, 1)
+
+    exact = range_grid(platform_pos[::50], x_vec, y_vec)
+    assert np.max(np.abs(ranges[::50] - exact)) < RANGE_TOLERANCE
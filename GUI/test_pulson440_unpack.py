@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of block-by-block unpacking of captures with lost packets
+"""
+
+# Import the required modules
+import numpy as np
+import pulson440_unpack
+from pulson440_benchmark import generate_capture
+
+# Test settings
+NUM_PULSES = 3000 # Scans written to the synthetic capture
+NUM_RANGE_BINS = 1200 # Range bins of each scan, three packets' worth
+PACKET_LOSS = 0.05 # Fraction of packets dropped from the capture
+
+def test_iter_unpack_blocks_with_lost_packets(tmp_path):
+    """
+    iter_unpack yields at most 'block_pulses' pulses per block when packets
+    are lost, and the blocks together match unpack.
+    """
+    file = str(tmp_path / 'lossy_data')
+    generate_capture(file, NUM_PULSES, NUM_RANGE_BINS,
+                     packet_loss=PACKET_LOSS)
+    data = pulson440_unpack.unpack(file)
+
+    for block_pulses in (1, 3, 100):
+        blocks = list(pulson440_unpack.iter_unpack(file, block_pulses))
+        assert max(time_stamp.size for time_stamp, _, _, _ in blocks) == \
+            block_pulses
+
+        num_pulses = sum(time_stamp.size for time_stamp, _, _, _ in blocks)
+        assert num_pulses >= NUM_PULSES - 2 * pulson440_unpack.REORDER_SCANS
+        assert np.array_equal(np.concatenate([block[0] for block in blocks]),
+                              data['time_stamp'][:num_pulses])
+        assert np.array_equal(np.concatenate([block[1] for block in blocks]),
+                              data['scan_data'][:num_pulses])
+        assert np.array_equal(np.concatenate([block[3] for block in blocks]),
+                              data['valid'][:num_pulses])
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Backprojection geometry cache module
+"""
+
+# Import the required modules
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from backprojection import block_ranges, BLOCK_PULSES
+
+# Cache settings
+GEOMETRY_MAX_BYTES = 1024**3 # Size above which entries are evicted (bytes)
+GEOMETRY_DTYPE = np.float32 # Precision of cached ranges; within microns at SAR ranges
+
+def geometry_key(platform_pos, x_vec, y_vec, dtype=float):
+    """
+    Key of the ranges between platform positions and an image grid; hashes
+    the positions and grid at the precision of dtype.
+    """
+    dtype = np.dtype(dtype)
+    digest = hashlib.sha1(dtype.str.encode())
+    for array in (platform_pos, x_vec, y_vec):
+        array = np.ascontiguousarray(array, dtype=dtype)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+def range_grid(platform_pos, x_vec, y_vec, dtype=float, out=None,
+               block_pulses=BLOCK_PULSES):
+    """
+    Ranges between each platform position and each point of the image grid,
+    an array of (pulses, y points, x points) of dtype; computed a block of
+    pulses at a time into out if given.
+    """
+    platform_pos = np.asarray(platform_pos, dtype=dtype)
+    x_vec = np.asarray(x_vec, dtype=dtype)
+    y_vec = np.asarray(y_vec, dtype=dtype)
+    num_pulses = len(platform_pos)
+    if out is None:
+        out = np.empty((num_pulses, len(y_vec), len(x_vec)), dtype=dtype)
+
+    # Squared distances between each platform position and each X and Y
+    # location of the image grid
+    x_dist_sq = (x_vec[np.newaxis, :] - platform_pos[:, 0:1])**2
+    y_dist_sq = (y_vec[np.newaxis, :] - platform_pos[:, 1:2])**2
+    z_dist_sq = platform_pos[:, 2]**2
+
+    # Compute the ranges of each block of pulses in place
+    for first in range(0, num_pulses, block_pulses):
+        block = slice(first, first + block_pulses)
+        block_ranges(x_dist_sq, y_dist_sq, z_dist_sq, block, out[block])
+    return out
+
+class GeometryCache(object):
+    """
+    Size-bounded cache of the ranges between platform positions and image
+    grids, keyed on the positions, grid and dtype; repeated images of the
+    same track and grid, e.g. with only the range offset changed, skip the
+    range computation. Ranges are held at the precision of GEOMETRY_DTYPE so
+    that those of the GUI's images fit, in memory or as memory-mapped .npy
+    files in cache_directory if given, and the least recently used entries
+    are evicted beyond max_bytes.
+    """
+    def __init__(self, max_bytes=GEOMETRY_MAX_BYTES, cache_directory=None):
+        self.max_bytes = max_bytes
+        self.cache_directory = cache_directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        """
+        State sent to other processes; in-memory entries are left behind
+        rather than copied.
+        """
+        state = self.__dict__.copy()
+        state['entries'] = OrderedDict()
+        return state
+
+    def entry_file(self, key):
+        """
+        File of an on-disk entry.
+        """
+        return os.path.join(self.cache_directory, '%s.npy' % key)
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache fits within
+        max_bytes; the entry given by keep is never removed.
+        """
+        if self.cache_directory is None:
+            total_bytes = sum(ranges.nbytes for ranges in self.entries.values())
+            for key in list(self.entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                if key != keep:
+                    total_bytes -= self.entries.pop(key).nbytes
+            return
+
+        entries = list()
+        for name in os.listdir(self.cache_directory):
+            if name.endswith('.npy'):
+                file = os.path.join(self.cache_directory, name)
+                try:
+                    entries.append((os.path.getmtime(file),
+                                    os.path.getsize(file), file))
+                except OSError:
+                    pass
+        entries.sort()
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, file in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            if keep is None or file != self.entry_file(keep):
+                total_bytes -= size
+                try:
+                    os.remove(file)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        self.entries.clear()
+        if self.cache_directory is not None and \
+                os.path.exists(self.cache_directory):
+            for name in os.listdir(self.cache_directory):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(self.cache_directory, name))
+
+    def ranges(self, platform_pos, x_vec, y_vec, dtype=float):
+        """
+        Ranges between each platform position and each point of the image
+        grid as from range_grid at the precision of dtype, stored as
+        GEOMETRY_DTYPE and read-only; None if they would not fit within
+        max_bytes, in which case the caller computes them as it goes.
+        """
+        dtype = np.dtype(dtype)
+        shape = (len(platform_pos), len(y_vec), len(x_vec))
+        num_bytes = np.dtype(GEOMETRY_DTYPE).itemsize * np.prod(shape)
+        if num_bytes > self.max_bytes:
+            return None
+        key = geometry_key(platform_pos, x_vec, y_vec, dtype)
+
+        # Serve from memory, marking the entry as most recently used
+        if self.cache_directory is None:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+            ranges = range_grid(platform_pos, x_vec, y_vec, dtype,
+                                out=np.empty(shape, dtype=GEOMETRY_DTYPE))
+            ranges.flags.writeable = False
+            self.entries[key] = ranges
+            self.evict(keep=key)
+            return ranges
+
+        # Serve from disk, marking the entry as most recently used
+        file = self.entry_file(key)
+        if os.path.exists(file):
+            try:
+                ranges = np.load(file, mmap_mode='r')
+                os.utime(file, None)
+                self.hits += 1
+                return ranges
+            except (OSError, ValueError):
+                pass
+
+        # Compute the ranges into a new entry; it is written under a temporary
+        # name first so that an interrupted write is never taken as an entry
+        self.misses += 1
+        if not os.path.exists(self.cache_directory):
+            os.makedirs(self.cache_directory)
+        temp_file = '%s.tmp' % file
+        ranges = np.lib.format.open_memmap(
+                temp_file, mode='w+', dtype=GEOMETRY_DTYPE, shape=shape)
+        range_grid(platform_pos, x_vec, y_vec, dtype, out=ranges)
+        ranges.flush()
+        del ranges
+        os.replace(temp_file, file)
+        self.evict(keep=key)
+        return np.load(file, mmap_mode='r')
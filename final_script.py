@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas
 import math
+from focus_metrics import entropy
 
 radar_data = unpack('UASSAR3_Final_1')
 platform_position_data = 'uassar3_final_2.csv'
@@ -206,31 +207,11 @@ def get_image_array(time_shift, size):
     return sar_image
 
 def get_entropy(magnitude_array):
-    entropy_sum = 0
-    minMag = magnitude_array[0][0] 
-    maxMag = magnitude_array[0][0]
-    for yy in range(len(magnitude_array)):
-        for xx in range(len(magnitude_array[yy])):
-            curr_mag = magnitude_array[yy][xx]
-            #print("max: " + str(maxMag) + "----- min: " + str(minMag))
-            if curr_mag > maxMag:
-                maxMag = curr_mag
-            if curr_mag < minMag:
-                minMag = curr_mag
-    
-    magDiff = np.abs(maxMag - minMag)
-    #print("magDiff = " + str(magDiff))
-    for yy in range(len(magnitude_array)):
-        for xx in range(len(magnitude_array[yy])):
-            curr_mag_final = np.abs(magnitude_array[yy][xx] - minMag)/magDiff
-            if (curr_mag_final != 0):
-                #print("currMagFinal: " + str(curr_mag_final))
-                entropy_sum += curr_mag_final*np.log2(curr_mag_final)
-    return -1*entropy_sum
+    return entropy(magnitude_array)
 
 def testEntropy(deviation, step, test_resolution):
     entropyArr = list()
-    combineArr = get_image_array(0, resolution)
+    combineArr = get_image_array(0, test_resolution)
     entropyArr.append(get_entropy(combineArr))
     for ii in np.arange(-deviation, deviation, step):
         combineArr = get_image_array(ii, test_resolution)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+SAR image focus metrics
+"""
+
+# Import the required modules
+import numpy as np
+
+def magnitudes(image, mask=None):
+    """
+    Magnitudes of the finite pixels of an image, or of those where mask is
+    True, as a flat array; float32 and complex64 images give float32
+    magnitudes.
+    """
+    values = np.abs(np.asarray(image)).ravel()
+    finite = np.isfinite(values)
+    if mask is not None:
+        finite &= np.asarray(mask, dtype=bool).ravel()
+    if finite.all():
+        return values
+    return values[finite]
+
+def entropy(image, mask=None):
+    """
+    Entropy -sum(p * log2(p)) of the magnitudes of an image scaled to p in
+    [0, 1] by their minimum and maximum, as computed by the imaging scripts'
+    get_entropy; lower is better focused. An image of a single magnitude has
+    no entropy.
+    """
+    values = magnitudes(image, mask)
+    if values.size == 0:
+        return 0.0
+    min_mag = values.min()
+    mag_range = values.max() - min_mag
+    if mag_range == 0:
+        return 0.0
+
+    # Scale magnitudes in place; zeros add nothing to the sum
+    values -= min_mag
+    values *= 1 / mag_range
+    values = values[values > 0]
+    return -float(np.dot(values, np.log2(values)))
+
+def sharpness(image, mask=None):
+    """
+    Sharpness sum(|I|^4) of an image; higher is better focused. Summed over
+    magnitudes scaled by their maximum so that float32 images do not
+    overflow.
+    """
+    values = magnitudes(image, mask)
+    if values.size == 0:
+        return 0.0
+    max_mag = values.max()
+    if max_mag == 0:
+        return 0.0
+    values *= 1 / max_mag
+    values *= values
+    return float(np.dot(values, values)) * float(max_mag)**4
+
+def contrast(image, mask=None):
+    """
+    Contrast std(|I|^2) / mean(|I|^2) of an image; higher is better focused.
+    """
+    values = magnitudes(image, mask)
+    if values.size == 0:
+        return 0.0
+    max_mag = values.max()
+    if max_mag == 0:
+        return 0.0
+    values *= 1 / max_mag
+    values *= values
+    return float(np.std(values) / np.mean(values))
+
+# Focus metrics; name -> (function, sign), where the sign makes lower values
+# better focused
+METRICS = {'entropy': (entropy, 1),
+           'sharpness': (sharpness, -1),
+           'contrast': (contrast, -1)}
+
+def focus_cost(image, metric='entropy', mask=None):
+    """
+    Focus metric of an image, by name, signed so that lower values are better
+    focused.
+    """
+    (function, sign) = METRICS[metric]
+    return sign * function(image, mask)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+PulsON 440 unpack throughput benchmark
+"""
+
+# Import the required modules
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import multiprocessing
+import numpy as np
+import pulson440_unpack
+from pulson440_formats import CONFIG_MSG_FORMAT
+from pulson440_constants import SPEED_OF_LIGHT, T_BIN
+from pulson440_unpack import (CONFIG_SIZE, LEGACY_CONFIG_SIZE, PACKET_FORMAT,
+                              PACKET_MSG_TYPE, PACKET_NUM_SAMPLES)
+
+# Peak memory is only available where the resource module is (not Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Configuration written to synthetic captures
+SYNTHETIC_CONFIG = {'node_id': 1,
+                    'scan_start': 30012,
+                    'scan_stop': 71027,
+                    'scan_res': 32,
+                    'pii': 13,
+                    'ant_mode': 2,
+                    'tx_gain_ind': 63,
+                    'code_channel': 0,
+                    'persist_flag': 0}
+SYNTHETIC_PRI = 10 # Time between synthetic scans (ms)
+
+def config_message(legacy=False):
+    """
+    Configuration data written at the start of a synthetic capture.
+    """
+    if legacy:
+        config_msg = bytearray(LEGACY_CONFIG_SIZE)
+        config_msg[4:8] = np.array(SYNTHETIC_CONFIG['node_id'], '>u4').tobytes()
+        config_msg[8:12] = np.array(SYNTHETIC_CONFIG['scan_start'],
+                                    '>i4').tobytes()
+        config_msg[12:16] = np.array(SYNTHETIC_CONFIG['scan_stop'],
+                                     '>i4').tobytes()
+        config_msg[16:18] = np.array(SYNTHETIC_CONFIG['scan_res'],
+                                     '>u2').tobytes()
+        config_msg[18:20] = np.array(SYNTHETIC_CONFIG['pii'], '>u2').tobytes()
+        config_msg[32] = SYNTHETIC_CONFIG['ant_mode']
+        config_msg[33] = SYNTHETIC_CONFIG['tx_gain_ind']
+        config_msg[34] = SYNTHETIC_CONFIG['code_channel']
+        config_msg[35] = SYNTHETIC_CONFIG['persist_flag']
+        return bytes(config_msg)
+
+    config_msg = b''
+    for config_field, dtype in CONFIG_MSG_FORMAT.items():
+        value = SYNTHETIC_CONFIG.get(config_field, 0)
+        config_msg += np.array(value, dtype.newbyteorder('>')).tobytes()
+    assert len(config_msg) == CONFIG_SIZE
+    return config_msg
+
+def generate_capture(file, num_pulses, num_range_bins, legacy=False,
+                     packet_loss=0.0, seed=0):
+    """
+    Write a synthetic capture of 'num_pulses' scans of 'num_range_bins' random
+    samples; the number of packets per scan follows from the number of range
+    bins. A fraction 'packet_loss' of the packets is dropped at random.
+    Returns the number of packets per scan.
+    """
+    rng = np.random.RandomState(seed)
+    num_packets_per_scan = int(math.ceil(num_range_bins / PACKET_NUM_SAMPLES))
+    num_samples = np.minimum(
+            PACKET_NUM_SAMPLES,
+            num_range_bins - PACKET_NUM_SAMPLES * np.arange(num_packets_per_scan))
+
+    with open(file, 'wb') as f:
+        f.write(config_message(legacy))
+
+        # Write a block of scans at a time to bound memory use
+        block_pulses = 1024
+        for first in range(0, num_pulses, block_pulses):
+            scans = np.arange(first, min(first + block_pulses, num_pulses))
+            packets = np.zeros((scans.size, num_packets_per_scan),
+                               dtype=PACKET_FORMAT)
+            packets['msg_type'] = PACKET_MSG_TYPE
+            packets['msg_id'] = (scans % 2**16)[:, np.newaxis]
+            packets['source_id'] = SYNTHETIC_CONFIG['node_id']
+            packets['time_stamp'] = (scans * SYNTHETIC_PRI)[:, np.newaxis]
+            packets['num_samples'] = num_samples
+            packets['num_range_bins'] = num_range_bins
+            packets['packet_ind'] = np.arange(num_packets_per_scan)
+            packets['num_packets_per_scan'] = num_packets_per_scan
+            packets['samples'] = rng.randint(
+                    -2**20, 2**20, size=packets.shape + (PACKET_NUM_SAMPLES,))
+            packets = packets.ravel()
+            if packet_loss:
+                packets = packets[rng.rand(packets.size) >= packet_loss]
+            packets.tofile(f)
+
+    return num_packets_per_scan
+
+def decode_unpack(file):
+    """
+    Unpack into memory; returns the number of pulses.
+    """
+    return pulson440_unpack.unpack(file)['scan_data'].shape[0]
+
+def decode_unpack_mmap(file):
+    """
+    Unpack with the scan data memory-mapped from a freshly written cache.
+    """
+    num_pulses = pulson440_unpack.unpack(file, mmap_mode='r')['scan_data'].shape[0]
+    os.remove('%s.mmap' % file)
+    return num_pulses
+
+def decode_iter_unpack(file):
+    """
+    Unpack a block of pulses at a time.
+    """
+    return sum(time_stamp.size for time_stamp, _, _, _ in
+               pulson440_unpack.iter_unpack(file))
+
+def reference_unpack(file):
+    """
+    Frozen copy of the original per-packet loop decoder, kept as the baseline
+    that the other decoders are measured against; only the configuration
+    header is read by pulson440_unpack so that both layouts are accepted.
+    Scans are assembled by packet count, so lost packets misalign them.
+    """
+    with open(file, 'rb') as f:
+        
+        # Read configuration part of data
+        config = pulson440_unpack.read_config_data(f)
+        
+        # Compute range bins in datas
+        scan_start_time = float(config['scan_start'])
+        start_range = SPEED_OF_LIGHT * ((scan_start_time * 1e-12) -
+                                        pulson440_unpack.DT_0 * 1e-9) / 2
+        
+        # Read data
+        data = dict()
+        data= {'scan_data': [],
+               'time_stamp': [],
+               'packet_ind': [],
+               'packet_pulse_ind': [],
+               'range_bins': [],
+               'config': config}
+        single_scan_data = []
+        packet_count = 0
+        pulse_count = 0
+        
+        while True:
+            
+            # Read a single data packet and break loop if not a complete packet
+            # (in terms of size)
+            packet = f.read(1452)
+            if len(packet) < 1452:
+                break            
+            
+            # Get information from first packet about how scans are stored and 
+            # range bins collected
+            if packet_count == 0:
+                num_range_bins = int(np.frombuffer(packet[44:48], dtype='>u4')[0])
+                num_packets_per_scan = int(np.frombuffer(packet[50:52], dtype='>u2')[0])
+                drange_bins = SPEED_OF_LIGHT * T_BIN * 1e-9 / 2
+                range_bins = start_range + drange_bins * np.arange(0, num_range_bins, 1)
+            packet_count += 1
+            
+            # Number of samples in current packet and packet index
+            num_samples = np.frombuffer(packet[42:44], dtype='>u2')[0]
+            data['packet_ind'].append(np.frombuffer(packet[48:50], dtype='>u2')[0])
+            
+            # Extract radar data samples from current packet; process last 
+            # packet within a scan seperately to get all data
+            packet_data = np.frombuffer(packet[52:(52 + 4 * num_samples)], 
+                                               dtype='>i4')
+            single_scan_data.append(packet_data)
+            
+            if packet_count % num_packets_per_scan == 0:
+                data['scan_data'].append(np.concatenate(single_scan_data))
+                data['time_stamp'].append(np.frombuffer(packet[8:12], 
+                    dtype='>u4')[0])
+                single_scan_data = []
+                pulse_count += 1
+            
+        # Add last partial scan if present
+        if single_scan_data:
+            single_scan_data = np.concatenate(single_scan_data)
+            num_pad = data['scan_data'][0].size - single_scan_data.size
+            single_scan_data = np.pad(single_scan_data, (0, num_pad), 
+                                      'constant', constant_values=0)
+            data['scan_data'].append(single_scan_data)
+                
+        # Stack scan data into 2-D array 
+        # (rows -> pulses, columns -> range bins)
+        data['scan_data'] = np.stack(data['scan_data'])
+        
+        # Finalize entries in data
+        data['time_stamp'] = np.asarray(data['time_stamp'])
+        data['range_bins'] = range_bins
+
+        return data
+
+def decode_reference(file):
+    """
+    Unpack with the original per-packet loop decoder.
+    """
+    return reference_unpack(file)['scan_data'].shape[0]
+
+# Decoders benchmarked; name -> function returning the number of pulses
+DECODERS = {'pulson440_unpack.unpack': decode_unpack,
+            'pulson440_unpack.unpack(mmap)': decode_unpack_mmap,
+            'pulson440_unpack.iter_unpack': decode_iter_unpack,
+            'reference': decode_reference}
+
+def peak_rss():
+    """
+    Peak resident set size of this process (MB), if available.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss / 1024**2
+    return max_rss / 1024
+
+def time_decoder(name, file, repeat):
+    """
+    Time the best of 'repeat' runs of a decoder; run in its own process so that
+    its peak memory is not inflated by other decoders.
+    """
+    elapsed = list()
+    for _ in range(repeat):
+        start = time.time()
+        num_pulses = DECODERS[name](file)
+        elapsed.append(time.time() - start)
+    return min(elapsed), num_pulses, peak_rss()
+
+def benchmark(file, decoders=None, repeat=3):
+    """
+    Benchmark decoders on a capture; returns a dictionary of results per
+    decoder.
+    """
+    num_bytes = os.path.getsize(file)
+    context = multiprocessing.get_context('spawn')
+    results = dict()
+    for name in (decoders or sorted(DECODERS)):
+        with context.Pool(1) as pool:
+            elapsed, num_pulses, max_rss = pool.apply(time_decoder,
+                                                      (name, file, repeat))
+        results[name] = {'seconds': elapsed,
+                         'pulses': num_pulses,
+                         'mb_per_s': num_bytes / 1e6 / max(elapsed, 1e-9),
+                         'pulses_per_s': num_pulses / max(elapsed, 1e-9),
+                         'peak_rss_mb': max_rss}
+    return results
+
+def parse_args(args):
+    """
+    Input argument parser.
+    """
+    parser = argparse.ArgumentParser(
+            description='PulsON 440 unpack throughput benchmark')
+    parser.add_argument('files', nargs='*',
+                        help='Existing captures to benchmark in addition')
+    parser.add_argument('-n', '--pulses', dest='pulses', type=int, default=20000,
+                        help='Number of pulses in each synthetic capture')
+    parser.add_argument('-b', '--range-bins', dest='range_bins', type=int,
+                        nargs='+', default=[672, 1344],
+                        help=('Range bins per scan of synthetic captures; sets '
+                              'the number of packets per scan'))
+    parser.add_argument('--packet-loss', dest='packet_loss', type=float,
+                        default=0.0,
+                        help='Fraction of packets dropped from synthetic captures')
+    parser.add_argument('-d', '--decoders', dest='decoders', nargs='+',
+                        default=None, choices=sorted(DECODERS),
+                        help='Decoders to benchmark; all by default')
+    parser.add_argument('-r', '--repeat', dest='repeat', type=int, default=3,
+                        help='Number of runs of which the best is reported')
+    parser.add_argument('-o', '--output', dest='output', default=None,
+                        help='JSON report file; printed if not given')
+
+    return parser.parse_args(args)
+
+def main(args):
+    """
+    Top-level function; parses input arguments, generates synthetic captures
+    in both header layouts, benchmarks every decoder and reports as JSON.
+    """
+    args = parse_args(args)
+
+    report = {'python': platform.python_version(),
+              'numpy': np.__version__,
+              'platform': platform.platform(),
+              'captures': list()}
+
+    # Benchmark synthetic captures in both layouts
+    directory = tempfile.mkdtemp(prefix='pulson440_benchmark')
+    try:
+        for num_range_bins in args.range_bins:
+            for legacy in (False, True):
+                file = os.path.join(directory, 'capture_%d_%d' %
+                                    (num_range_bins, legacy))
+                num_packets_per_scan = generate_capture(
+                        file, args.pulses, num_range_bins, legacy,
+                        args.packet_loss)
+                report['captures'].append({
+                        'file': 'synthetic',
+                        'legacy': legacy,
+                        'pulses': args.pulses,
+                        'range_bins': num_range_bins,
+                        'packets_per_scan': num_packets_per_scan,
+                        'packet_loss': args.packet_loss,
+                        'bytes': os.path.getsize(file),
+                        'results': benchmark(file, args.decoders, args.repeat)})
+                os.remove(file)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # Benchmark existing captures
+    for file in args.files:
+        report['captures'].append({
+                'file': file,
+                'bytes': os.path.getsize(file),
+                'results': benchmark(file, args.decoders, args.repeat)})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+    return report
+
+if __name__ == "__main__":
+    """
+    Standard Python alias for command line execution.
+    """
+    main(sys.argv[1:])
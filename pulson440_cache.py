@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+PulsON 440 unpacked data cache module
+"""
+
+# Import the required modules
+import os
+import json
+import shutil
+import hashlib
+from pulson440_unpack import unpack, save_data, load_data
+
+# Cache settings
+CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.pulson440_cache')
+CACHE_MAX_BYTES = 4 * 1024**3 # Size above which entries are evicted (bytes)
+SOURCE_FILE = 'source.json' # Name of file describing an entry's source file
+HASH_BLOCK_SIZE = 1024**2 # Bytes hashed from each end of a source file
+
+def content_hash(file):
+    """
+    Fast content hash of a file; hashes its size and first and last blocks.
+    """
+    size = os.path.getsize(file)
+    digest = hashlib.sha1(str(size).encode())
+    with open(file, 'rb') as f:
+        digest.update(f.read(HASH_BLOCK_SIZE))
+        if size > HASH_BLOCK_SIZE:
+            f.seek(max(HASH_BLOCK_SIZE, size - HASH_BLOCK_SIZE))
+            digest.update(f.read(HASH_BLOCK_SIZE))
+    return digest.hexdigest()
+
+def describe_source(file):
+    """
+    Description of a source file used to validate cache entries.
+    """
+    stat = os.stat(file)
+    return {'path': os.path.abspath(file),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': content_hash(file)}
+
+def entry_directory(file, legacy=None, cache_directory=CACHE_DIRECTORY):
+    """
+    Cache entry directory of a source file.
+    """
+    key = '%s:%s' % (os.path.abspath(file), legacy)
+    return os.path.join(cache_directory,
+                        hashlib.sha1(key.encode()).hexdigest())
+
+def directory_size(directory):
+    """
+    Total size of the files in a directory (bytes); a directory removed in the
+    meantime (e.g. by another process evicting it) has no size.
+    """
+    try:
+        return sum(os.path.getsize(os.path.join(directory, name))
+                   for name in os.listdir(directory))
+    except OSError:
+        return 0
+
+def evict(cache_directory=CACHE_DIRECTORY, max_bytes=CACHE_MAX_BYTES,
+          keep=None):
+    """
+    Remove least recently used entries until the cache fits within max_bytes;
+    the entry given by keep is never removed.
+    """
+    entries = list()
+    for name in os.listdir(cache_directory):
+        directory = os.path.join(cache_directory, name)
+        source_file = os.path.join(directory, SOURCE_FILE)
+        if os.path.exists(source_file):
+            entries.append((os.path.getmtime(source_file), directory))
+    entries.sort()
+
+    total_bytes = sum(directory_size(directory) for _, directory in entries)
+    for _, directory in entries:
+        if total_bytes <= max_bytes:
+            break
+        if directory != keep:
+            total_bytes -= directory_size(directory)
+            shutil.rmtree(directory, ignore_errors=True)
+
+def cached_unpack(file, legacy=None, cache_directory=CACHE_DIRECTORY,
+                  max_bytes=CACHE_MAX_BYTES):
+    """
+    Unpacks PulsOn 440 radar data from input file through an on-disk cache; a
+    cache hit returns memory-mapped arrays and is refused if the file's path,
+    size, modification time or content hash have changed since it was cached.
+    """
+    directory = entry_directory(file, legacy, cache_directory)
+    source_file = os.path.join(directory, SOURCE_FILE)
+    source = describe_source(file)
+
+    # Serve from the cache if the entry describes the same file; mark the entry
+    # as most recently used
+    if os.path.exists(source_file):
+        with open(source_file, 'r') as f:
+            cached_source = json.load(f)
+        if cached_source == source:
+            os.utime(source_file, None)
+            return load_data(directory)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # Unpack and add a new entry; the source description is written last so
+    # that an interrupted write is never taken as a valid entry
+    data = unpack(file, legacy)
+    if not os.path.exists(cache_directory):
+        os.makedirs(cache_directory)
+    save_data(data, directory)
+    with open(source_file, 'w') as f:
+        json.dump(source, f, indent=4)
+    evict(cache_directory, max_bytes, keep=directory)
+
+    return data
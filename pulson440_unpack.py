@@ -6,6 +6,10 @@ PulsON 440 radar data unpacking module
 # Import the required modules
 import os
 import sys
+import json
+import math
+import time
+import shutil
 import argparse
 import pickle
 import matplotlib.pyplot as plt
@@ -14,9 +18,40 @@ from pulson440_formats import CONFIG_MSG_FORMAT
 from pulson440_constants import SPEED_OF_LIGHT, T_BIN
 from matplotlib.ticker import Formatter
 from matplotlib.figure import Figure
+from collections.abc import Mapping
 
 # Constants
 DT_0 = 10 # Path delay through antennas (ns)
+CONFIG_SIZE = 32 # Size of configuration data at start of file (bytes)
+LEGACY_CONFIG_SIZE = 44 # Size of legacy configuration data (bytes)
+PACKET_SIZE = 1452 # Size of a single scan data packet (bytes)
+PACKET_MSG_TYPE = 0xF201 # Message type of scan data packets (MRM_SCAN_INFO)
+PACKET_NUM_SAMPLES = 350 # Maximum number of samples in a single packet
+REORDER_SCANS = 4 # Number of scans late a packet may arrive when read in blocks
+
+# Scan data packet format; header fields followed by a fixed length block of
+# samples of which only the first 'num_samples' are valid; refer to API for
+# more details
+PACKET_FORMAT = np.dtype([
+    ('msg_type', '>u2'), # Message type
+    ('msg_id', '>u2'), # Message ID; increments with every scan
+    ('source_id', '>u4'), # Source (node) ID
+    ('time_stamp', '>u4'), # Time stamp (ms)
+    ('reserved', 'V30'), # Scan settings; not used
+    ('num_samples', '>u2'), # Number of valid samples in packet
+    ('num_range_bins', '>u4'), # Total number of samples in scan
+    ('packet_ind', '>u2'), # Index of packet within scan
+    ('num_packets_per_scan', '>u2'), # Number of packets in scan
+    ('samples', '>i4', (PACKET_NUM_SAMPLES,))]) # Radar data samples
+
+# Memory-mapped scan data cache settings
+MMAP_FORMAT = np.dtype('<i4') # Data type of cached scan data
+MMAP_BLOCK_SCANS = 1024 # Number of scans assembled at a time into the cache
+
+# Unpacked data storage format; a directory with one .npy file per array and a
+# JSON header holding the configuration
+DATA_FORMAT_VERSION = 1 # Version of the storage format
+DATA_HEADER_FILE = 'header.json' # Name of the header file
 
 class value_formatter(Formatter):
     """
@@ -38,14 +73,205 @@ class value_formatter(Formatter):
             return ''
         return '%3.1f  [%d]' % (self.values[ind], ind)
 
-def read_config_data(file_handle, legacy=False):
+class UnpackedData(Mapping):
+    """
+    Read-only unpacked data saved by save_data; each array is memory-mapped
+    from its own file the first time it is accessed.
+    """
+
+    def __init__(self, directory, header):
+        """
+        Set up lazy access to the arrays listed in the header.
+        """
+        self.directory = directory
+        self.header = header
+        self.arrays = dict()
+        self.config = dict()
+        for config_field, value in header['config'].items():
+            if value is not None:
+                value = CONFIG_MSG_FORMAT[config_field].type(value)
+            self.config[config_field] = value
+
+    def __getitem__(self, key):
+        """
+        Return the configuration or the memory-mapped array for key.
+        """
+        if key == 'config':
+            return self.config
+        if key not in self.header['arrays']:
+            raise KeyError(key)
+        if key not in self.arrays:
+            self.arrays[key] = np.load(
+                    os.path.join(self.directory, '%s.npy' % key), mmap_mode='r')
+        return self.arrays[key]
+
+    def __iter__(self):
+        """
+        Iterate over the stored entries.
+        """
+        return iter(self.header['arrays'] + ['config'])
+
+    def __len__(self):
+        """
+        Number of stored entries.
+        """
+        return len(self.header['arrays']) + 1
+
+class FollowedData(Mapping):
     """
-    Read in configuration data based on platform.
+    Data unpacked incrementally from a file that is still being written; each
+    call to poll decodes only the whole packets appended since the last call
+    and adds their pulses to a ring holding the most recent 'max_pulses'
+    pulses. The ring's scan data is memory-mapped from ring_file if given.
+    """
+
+    def __init__(self, file, max_pulses=8192, legacy=None, ring_file=None,
+                 block_pulses=256):
+        """
+        Set up following of file; nothing is read until the first poll.
+        """
+        self.file = file
+        self.max_pulses = max_pulses
+        self.legacy = legacy
+        self.ring_file = ring_file
+        self.block_pulses = block_pulses
+        self.offset = 0 # File position of the next packet to decode (bytes)
+        self.msg_id = None # Message ID of the next scan to decode
+        self.num_pulses = 0 # Number of pulses decoded so far
+        self.config = None
+        self.range_bins = None
+        self.layout = None
+        self.ring = None
+
+    def start(self, file_handle):
+        """
+        Read the configuration and scan layout once the first packet has been
+        written; returns whether they are available yet.
+        """
+        if (os.fstat(file_handle.fileno()).st_size <
+                LEGACY_CONFIG_SIZE + PACKET_SIZE):
+            return False
+        config = read_config_data(file_handle, self.legacy)
+        offset = file_handle.tell()
+        first_packet = read_packets(file_handle, 1)
+        if first_packet.size == 0:
+            return False
+        check_packets(first_packet, self.file)
+        num_range_bins, num_packets_per_scan = scan_layout(first_packet)
+
+        # Allocate the ring
+        shape = (self.max_pulses, num_range_bins)
+        if self.ring_file is None:
+            scan_data = np.zeros(shape, dtype=np.int32)
+        else:
+            scan_data = np.memmap(self.ring_file, dtype=MMAP_FORMAT, mode='w+',
+                                  shape=shape)
+        self.ring = {'scan_data': scan_data,
+                     'time_stamp': np.zeros(self.max_pulses, dtype=np.uint32),
+                     'valid': np.zeros(self.max_pulses, dtype=bool)}
+
+        self.config = config
+        self.range_bins = compute_range_bins(config, num_range_bins)
+        self.layout = (num_range_bins, num_packets_per_scan)
+        self.offset = offset
+        return True
+
+    def poll(self):
+        """
+        Decode the whole scans appended to the file since the last poll;
+        returns the number of new pulses.
+        """
+        num_new = 0
+        with open(self.file, 'rb') as f:
+            if self.layout is None and not self.start(f):
+                return 0
+            f.seek(self.offset)
+            while True:
+                scans = read_scans(f, self.layout[0], self.layout[1],
+                                   self.block_pulses, self.msg_id)
+                if scans is None:
+                    break
+                self.offset = f.tell()
+                (time_stamp, scan_data, _, valid), self.msg_id = scans
+                self.append(time_stamp, scan_data, valid)
+                num_new += time_stamp.size
+        return num_new
+
+    def append(self, time_stamp, scan_data, valid):
+        """
+        Add pulses to the ring, overwriting the oldest pulses once it is full.
+        """
+        num_new = min(time_stamp.size, self.max_pulses)
+        positions = (self.num_pulses + np.arange(time_stamp.size - num_new,
+                                                 time_stamp.size))
+        positions %= self.max_pulses
+        self.ring['scan_data'][positions] = scan_data[-num_new:]
+        self.ring['time_stamp'][positions] = time_stamp[-num_new:]
+        self.ring['valid'][positions] = valid[-num_new:]
+        self.num_pulses += time_stamp.size
+
+    @property
+    def first_pulse(self):
+        """
+        Index of the oldest pulse held in the ring.
+        """
+        return max(0, self.num_pulses - self.max_pulses)
+
+    def __getitem__(self, key):
+        """
+        Return the configuration, range bins or the pulses in the ring in the
+        order they were received.
+        """
+        if key == 'config':
+            return self.config
+        if key == 'range_bins':
+            return self.range_bins
+        if key not in ('scan_data', 'time_stamp', 'valid'):
+            raise KeyError(key)
+        if self.ring is None:
+            return np.zeros(0)
+        order = np.arange(self.first_pulse, self.num_pulses) % self.max_pulses
+        return self.ring[key][order]
+
+    def __iter__(self):
+        """
+        Iterate over the entries.
+        """
+        return iter(['scan_data', 'time_stamp', 'valid', 'range_bins', 'config'])
+
+    def __len__(self):
+        """
+        Number of entries.
+        """
+        return 5
+
+def detect_legacy(file_handle):
+    """
+    Detect whether a file starts with legacy or current configuration data by
+    locating the first scan data packet; the file position is left unchanged.
+    """
+    start = file_handle.tell()
+    header = file_handle.read(LEGACY_CONFIG_SIZE + 2)
+    file_handle.seek(start)
+    for legacy, config_size in ((False, CONFIG_SIZE),
+                                (True, LEGACY_CONFIG_SIZE)):
+        msg_type = header[config_size:(config_size + 2)]
+        if (len(msg_type) == 2 and
+                np.frombuffer(msg_type, dtype='>u2')[0] == PACKET_MSG_TYPE):
+            return legacy
+    raise ValueError('%s is not PulsON 440 scan data!' % file_handle.name)
+
+def read_config_data(file_handle, legacy=None):
+    """
+    Read in configuration data based on platform; the format is detected from
+    the file if legacy is None.
     """
     config = dict.fromkeys(CONFIG_MSG_FORMAT.keys())
+    if legacy is None:
+        legacy = detect_legacy(file_handle)
     
     if legacy:
-        config_msg = file_handle.read(44)
+        config_msg = file_handle.read(LEGACY_CONFIG_SIZE)
         config['node_id'] = np.frombuffer(config_msg[4:8], dtype='>u4')[0]
         config['scan_start'] = np.frombuffer(config_msg[8:12], dtype='>i4')[0]
         config['scan_stop'] = np.frombuffer(config_msg[12:16], dtype='>i4')[0]
@@ -57,7 +283,7 @@ def read_config_data(file_handle, legacy=False):
         config['persist_flag'] = np.uint16(config_msg[35])
         
     else:
-        config_msg = file_handle.read(32)
+        config_msg = file_handle.read(CONFIG_SIZE)
         byte_counter = 0
         for config_field in CONFIG_MSG_FORMAT.keys():
             num_bytes = CONFIG_MSG_FORMAT[config_field].itemsize
@@ -69,82 +295,430 @@ def read_config_data(file_handle, legacy=False):
             
     return config
 
-def unpack(file, legacy=False):
+def check_packets(packets, file):
     """
-    Unpacks PulsOn 440 radar data from input file
+    Check that the packets read from a file are scan data packets.
+    """
+    if packets.size == 0:
+        raise ValueError('No complete packets in %s!' % file)
+    if packets['msg_type'][0] != PACKET_MSG_TYPE:
+        raise ValueError('%s is not PulsON 440 scan data!' % file)
+
+def scan_layout(packets):
+    """
+    Number of range bins and packets per scan given by the first packet.
+    """
+    num_range_bins = int(packets['num_range_bins'][0])
+    num_packets_per_scan = int(packets['num_packets_per_scan'][0])
+    if num_packets_per_scan != math.ceil(num_range_bins / PACKET_NUM_SAMPLES):
+        raise ValueError('Inconsistent scan layout of %d range bins in %d '
+                         'packets!' % (num_range_bins, num_packets_per_scan))
+    return num_range_bins, num_packets_per_scan
+
+def read_packets(file_handle, count=-1):
+    """
+    Read complete scan data packets from the current position of the file as a
+    structured array; any trailing partial packet is left unread.
+    """
+    # Only read whole packets so that the file position always lands on a
+    # packet boundary
+    start = file_handle.tell()
+    file_handle.seek(0, os.SEEK_END)
+    num_packets = (file_handle.tell() - start) // PACKET_SIZE
+    file_handle.seek(start)
+    if count >= 0:
+        num_packets = min(num_packets, count)
+    return np.fromfile(file_handle, dtype=PACKET_FORMAT, count=num_packets)
+
+def map_packets(file_handle):
+    """
+    Memory-map complete scan data packets from the current position of the file
+    as a read-only structured array.
+    """
+    start = file_handle.tell()
+    num_packets = (os.fstat(file_handle.fileno()).st_size - start) // PACKET_SIZE
+    return np.memmap(file_handle, dtype=PACKET_FORMAT, mode='r', offset=start,
+                     shape=(num_packets,))
+
+def packet_samples(num_range_bins, num_packets_per_scan):
+    """
+    Number of valid samples in the packet at each position within a scan.
+    """
+    positions = np.arange(int(num_packets_per_scan))
+    return np.minimum(PACKET_NUM_SAMPLES,
+                      int(num_range_bins) - PACKET_NUM_SAMPLES * positions)
+
+def msg_id_step(step):
+    """
+    Signed step between message IDs; the IDs wrap around at 2**16.
+    """
+    return (step + 2**15) % 2**16 - 2**15
+
+def locate_packets(packets, num_range_bins, num_packets_per_scan,
+                   first_msg_id=None):
+    """
+    Locate packets within the scan data by their message ID (scan counter) and
+    packet index rather than by counting, so that lost, duplicated or late
+    packets cannot shift later scans. Returns the pulse (row) of each packet,
+    -1 for packets that do not fit the scan layout, and the number of pulses;
+    pulses are the scans seen from the scan with ID first_msg_id onwards, or
+    from the scan of the first packet if not given.
+    """
+    # Steps between message IDs are taken modulo the counter range so that the
+    # counter wrapping around is a step forward and a late packet a step back
+    msg_id = packets['msg_id'].astype(np.int64)
+    scans = np.concatenate(([0], np.cumsum(msg_id_step(np.diff(msg_id)))))
+    if first_msg_id is not None:
+        scans += msg_id_step(msg_id[0] - first_msg_id)
+
+    # Only packets whose header matches the scan layout are placed; anything
+    # else is treated as lost
+    packet_ind = packets['packet_ind'].astype(np.int64)
+    placed = ((packets['msg_type'] == PACKET_MSG_TYPE) & (scans >= 0) &
+              (packet_ind < num_packets_per_scan))
+    num_samples = packet_samples(num_range_bins, num_packets_per_scan)
+    placed[placed] = (packets['num_samples'][placed] ==
+                      num_samples[packet_ind[placed]])
+
+    # Every scan seen becomes a pulse
+    pulses = np.full(packets.size, -1, dtype=np.int64)
+    scan_ids, pulses[placed] = np.unique(scans[placed], return_inverse=True)
+
+    return pulses, scan_ids.size
+
+def scan_status(packets, pulses, num_pulses, num_packets_per_scan):
+    """
+    Time stamp of each pulse and whether all of its packets were received.
+    """
+    placed = pulses >= 0
+    time_stamp = np.zeros(num_pulses, dtype=np.uint32)
+    time_stamp[pulses[placed]] = packets['time_stamp'][placed]
+    received = np.zeros((num_pulses, int(num_packets_per_scan)), dtype=bool)
+    received[pulses[placed], packets['packet_ind'][placed]] = True
+    return time_stamp, received.all(axis=1)
+
+def assemble_scans(packets, num_range_bins, num_packets_per_scan, pulses=None,
+                   num_pulses=None):
+    """
+    Assemble packets into scans (rows -> pulses, columns -> range bins); missing
+    packets are left zeroed. Returns the scan data, the time stamp of each
+    pulse and a validity mask that is False for pulses missing any packets.
+    The pulse of each packet is located from the packets unless given.
+    """
+    num_range_bins = int(num_range_bins)
+    num_packets_per_scan = int(num_packets_per_scan)
+    if pulses is None:
+        pulses, num_pulses = locate_packets(packets, num_range_bins,
+                                            num_packets_per_scan)
+
+    # Scatter the valid samples of each packet position across all the pulses
+    # at once
+    num_samples = packet_samples(num_range_bins, num_packets_per_scan)
+    offsets = np.concatenate(([0], np.cumsum(num_samples)))
+    packet_ind = packets['packet_ind']
+    samples = packets['samples']
+    scan_data = np.zeros((num_pulses, num_range_bins), dtype=np.int32)
+    for ii in range(num_packets_per_scan):
+        position = (pulses >= 0) & (packet_ind == ii)
+        scan_data[pulses[position], offsets[ii]:offsets[ii + 1]] = \
+            samples[position, :num_samples[ii]]
+
+    time_stamp, valid = scan_status(packets, pulses, num_pulses,
+                                    num_packets_per_scan)
+
+    return scan_data, time_stamp, valid
+
+def map_scans(file, packets, num_range_bins, num_packets_per_scan, pulses,
+              num_pulses, mmap_mode='r'):
+    """
+    Memory-map scan data from a cache file written alongside the data file; the
+    cache is (re)written a block of pulses at a time whenever it is missing or
+    older than the data file. Returns the same as assemble_scans.
+    """
+    num_range_bins = int(num_range_bins)
+    num_packets_per_scan = int(num_packets_per_scan)
+    shape = (num_pulses, num_range_bins)
+    cache_file = '%s.mmap' % file
+
+    # Check whether the existing cache is still valid
+    cache_size = shape[0] * shape[1] * MMAP_FORMAT.itemsize
+    stale = (not os.path.exists(cache_file) or
+             os.path.getsize(cache_file) != cache_size or
+             os.path.getmtime(cache_file) < os.path.getmtime(file))
+
+    # Write the cache in blocks of pulses so that only one block is ever held
+    # in memory; packets are gathered by pulse as they may be out of order
+    if stale:
+        temp_file = '%s.tmp' % cache_file
+        cache = np.memmap(temp_file, dtype=MMAP_FORMAT, mode='w+', shape=shape)
+        order = np.argsort(pulses, kind='stable')
+        bounds = np.searchsorted(pulses[order],
+                                 np.arange(0, num_pulses + MMAP_BLOCK_SCANS,
+                                           MMAP_BLOCK_SCANS))
+        for jj, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+            first = jj * MMAP_BLOCK_SCANS
+            last = min(first + MMAP_BLOCK_SCANS, num_pulses)
+            block, _, _ = assemble_scans(
+                    packets[order[lo:hi]], num_range_bins, num_packets_per_scan,
+                    pulses[order[lo:hi]] - first, last - first)
+            cache[first:last] = block
+        cache.flush()
+        del cache
+        os.replace(temp_file, cache_file)
+
+    time_stamp, valid = scan_status(packets, pulses, num_pulses,
+                                    num_packets_per_scan)
+
+    scan_data = np.memmap(cache_file, dtype=MMAP_FORMAT, mode=mmap_mode,
+                          shape=shape)
+    return scan_data, time_stamp, valid
+
+def compute_range_bins(config, num_range_bins):
+    """
+    Compute the range (m) of each range bin in a scan.
+    """
+    scan_start_time = float(config['scan_start'])
+    start_range = SPEED_OF_LIGHT * ((scan_start_time * 1e-12) - DT_0 * 1e-9) / 2
+    drange_bins = SPEED_OF_LIGHT * T_BIN * 1e-9 / 2
+    return start_range + drange_bins * np.arange(0, num_range_bins, 1)
+
+def read_header(file, legacy=None):
+    """
+    Read the configuration and range bins of a data file from its configuration
+    data and first packet only.
     """
     with open(file, 'rb') as f:
-        
+        config = read_config_data(f, legacy)
+        packets = read_packets(f, 1)
+    check_packets(packets, file)
+    num_range_bins, _ = scan_layout(packets)
+    return config, compute_range_bins(config, num_range_bins)
+
+def read_scans(file_handle, num_range_bins, num_packets_per_scan,
+               block_pulses=256, first_msg_id=None):
+    """
+    Read and assemble up to 'block_pulses' scans from the current position of
+    the file, starting from the scan with ID first_msg_id if given; returns
+    (time_stamp, scan_data, packet_ind, valid) and the ID of the scan that
+    follows, or None if no scan is complete yet. The file is left positioned
+    at the first packet of the first scan not returned, which is the last
+    scan if that scan is still incomplete.
+    """
+    # Read the next block of packets and locate them within the scans; lost
+    # packets let the block span more than 'block_pulses' scans
+    count = max(block_pulses, 2 * REORDER_SCANS) * num_packets_per_scan
+    packets = read_packets(file_handle, count)
+    if packets.size == 0:
+        return None
+    pulses, num_pulses = locate_packets(packets, num_range_bins,
+                                        num_packets_per_scan, first_msg_id)
+    if num_pulses == 0:
+        return None
+
+    # Put back the packets from the first incomplete scan among the last few
+    # as its missing packets may still arrive late, and those of any scans
+    # beyond the first 'block_pulses'; packets of earlier scans that are read
+    # again are dropped by the next block
+    _, valid = scan_status(packets, pulses, num_pulses, num_packets_per_scan)
+    held = num_pulses
+    incomplete = np.flatnonzero(~valid[-REORDER_SCANS:])
+    if incomplete.size:
+        held = max(num_pulses - REORDER_SCANS, 0) + incomplete[0]
+        if held == 0 and packets.size == count:
+            held = num_pulses
+    held = min(held, block_pulses)
+    if held < num_pulses:
+        first = np.argmax(pulses >= held)
+        file_handle.seek((first - packets.size) * PACKET_SIZE, os.SEEK_CUR)
+        kept = pulses < held
+        packets = packets[kept]
+        pulses = pulses[kept]
+        num_pulses = held
+    if num_pulses == 0:
+        return None
+
+    scan_data, time_stamp, valid = assemble_scans(
+            packets, num_range_bins, num_packets_per_scan, pulses, num_pulses)
+    last_msg_id = packets['msg_id'][np.argmax(pulses == num_pulses - 1)]
+
+    return ((time_stamp, scan_data, packets['packet_ind'].astype(np.uint16),
+             valid), (int(last_msg_id) + 1) % 2**16)
+
+def iter_unpack(file, block_pulses=256, legacy=None):
+    """
+    Unpacks PulsOn 440 radar data from input file a block of pulses at a time;
+    yields (time_stamp, scan_data, packet_ind, valid) for up to 'block_pulses'
+    pulses so that only one block is held in memory. Iteration stops once the
+    scans currently in the file are exhausted so a file that is still being
+    written can be read up to its last complete scan; scans near the end that
+    are missing packets are held back in case the packets arrive late.
+    """
+    with open(file, 'rb') as f:
+
+        # Read configuration part of data and determine how scans are stored
+        # from the first packet
+        read_config_data(f, legacy)
+        start = f.tell()
+        first_packet = read_packets(f, 1)
+        if first_packet.size == 0:
+            return
+        check_packets(first_packet, file)
+        f.seek(start)
+        num_range_bins, num_packets_per_scan = scan_layout(first_packet)
+        msg_id = None
+
+        while True:
+            scans = read_scans(f, num_range_bins, num_packets_per_scan,
+                               block_pulses, msg_id)
+            if scans is None:
+                return
+            block, msg_id = scans
+            yield block
+
+def unpack(file, legacy=None, mmap_mode=None, dtype=None):
+    """
+    Unpacks PulsOn 440 radar data from input file; the configuration format is
+    detected from the file unless legacy is given. If a memory-map mode ('r',
+    'r+' or 'c') is given the scan data is memory-mapped from a cache file
+    instead of being read into memory. Pulses missing any packets are zero
+    filled where data was lost and marked False in 'valid'. Scan data is
+    int32 unless a dtype (e.g. np.float32) is given, which range bins are
+    converted to as well.
+    """
+    with open(file, 'rb') as f:
+
         # Read configuration part of data
         config = read_config_data(f, legacy)
-        
-        # Compute range bins in datas
-        scan_start_time = float(config['scan_start'])
-        start_range = SPEED_OF_LIGHT * ((scan_start_time * 1e-12) - DT_0 * 1e-9) / 2
-        
-        # Read data
-        data = dict()
-        data= {'scan_data': [],
-               'time_stamp': [],
-               'packet_ind': [],
-               'packet_pulse_ind': [],
-               'range_bins': [],
-               'config': config}
-        single_scan_data = []
-        packet_count = 0
-        pulse_count = 0
-        
+
+        # Read (or map) all complete packets in one pass
+        if mmap_mode is None:
+            packets = read_packets(f)
+        else:
+            packets = map_packets(f)
+        check_packets(packets, file)
+
+    # Compute range bins in data; how scans are stored and range bins collected
+    # is given by the first packet
+    num_range_bins, num_packets_per_scan = scan_layout(packets)
+    range_bins = compute_range_bins(config, num_range_bins)
+
+    # Stack scan data into 2-D array
+    # (rows -> pulses, columns -> range bins)
+    pulses, num_pulses = locate_packets(packets, num_range_bins,
+                                        num_packets_per_scan)
+    if mmap_mode is None:
+        scan_data, time_stamp, valid = assemble_scans(
+                packets, num_range_bins, num_packets_per_scan, pulses,
+                num_pulses)
+    else:
+        scan_data, time_stamp, valid = map_scans(
+                file, packets, num_range_bins, num_packets_per_scan, pulses,
+                num_pulses, mmap_mode)
+
+    # Convert to the requested precision
+    if dtype is not None:
+        scan_data = scan_data.astype(dtype)
+        range_bins = range_bins.astype(dtype)
+
+    # Finalize entries in data
+    data = {'scan_data': scan_data,
+            'time_stamp': time_stamp,
+            'valid': valid,
+            'packet_ind': list(packets['packet_ind'].astype(np.uint16)),
+            'packet_pulse_ind': pulses,
+            'range_bins': range_bins,
+            'config': config}
+
+    return data
+
+def follow(file, interval=1.0, max_pulses=8192, legacy=None):
+    """
+    Follow a file that is still being written, polling it every 'interval'
+    seconds until interrupted (Ctrl-C); returns the followed data.
+    """
+    data = FollowedData(file, max_pulses, legacy)
+    try:
         while True:
-            
-            # Read a single data packet and break loop if not a complete packet
-            # (in terms of size)
-            packet = f.read(1452)
-            if len(packet) < 1452:
-                break            
-            
-            # Get information from first packet about how scans are stored and 
-            # range bins collected
-            if packet_count == 0:
-                num_range_bins = np.frombuffer(packet[44:48], dtype='>u4')[0]
-                num_packets_per_scan = np.frombuffer(packet[50:52], dtype='>u2')[0]
-                drange_bins = SPEED_OF_LIGHT * T_BIN * 1e-9 / 2
-                range_bins = start_range + drange_bins * np.arange(0, num_range_bins, 1)
-            packet_count += 1
-            
-            # Number of samples in current packet and packet index
-            num_samples = np.frombuffer(packet[42:44], dtype='>u2')[0]
-            data['packet_ind'].append(np.frombuffer(packet[48:50], dtype='>u2')[0])
-            
-            # Extract radar data samples from current packet; process last 
-            # packet within a scan seperately to get all data
-            packet_data = np.frombuffer(packet[52:(52 + 4 * num_samples)], 
-                                               dtype='>i4')
-            single_scan_data.append(packet_data)
-            
-            if packet_count % num_packets_per_scan == 0:
-                data['scan_data'].append(np.concatenate(single_scan_data))
-                data['time_stamp'].append(np.frombuffer(packet[8:12], 
-                    dtype='>u4')[0])
-                single_scan_data = []
-                pulse_count += 1
-            
-        # Add last partial scan if present
-        if single_scan_data:
-            single_scan_data = np.concatenate(single_scan_data)
-            num_pad = data['scan_data'][0].size - single_scan_data.size
-            single_scan_data = np.pad(single_scan_data, (0, num_pad), 
-                                      'constant', constant_values=0)
-            data['scan_data'].append(single_scan_data)
-                
-        # Stack scan data into 2-D array 
-        # (rows -> pulses, columns -> range bins)
-        data['scan_data'] = np.stack(data['scan_data'])
-        
-        # Finalize entries in data
-        data['time_stamp'] = np.asarray(data['time_stamp'])
-        data['range_bins'] = range_bins
+            if data.poll():
+                print('%d pulses (%d missing packets)' %
+                      (data.num_pulses, np.count_nonzero(~data['valid'])))
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    return data
+
+def save_data(data, directory):
+    """
+    Save unpacked data to a directory holding one .npy file per array and a
+    JSON header with the configuration; an existing data directory is replaced.
+    """
+    directory = os.path.normpath(directory)
+    if (os.path.exists(directory) and not
+            os.path.exists(os.path.join(directory, DATA_HEADER_FILE))):
+        raise ValueError('%s exists and is not unpacked data!' % directory)
+
+    # Write everything to a temporary directory first so that a partially
+    # written directory is never mistaken for valid data
+    temp_directory = '%s.tmp' % directory
+    if os.path.exists(temp_directory):
+        shutil.rmtree(temp_directory)
+    os.makedirs(temp_directory)
+
+    header = {'version': DATA_FORMAT_VERSION, 'arrays': [], 'config': dict()}
+    for key, value in data.items():
+        if key == 'config':
+            for config_field, config_value in value.items():
+                if config_value is not None:
+                    config_value = int(config_value)
+                header['config'][config_field] = config_value
+        else:
+            np.save(os.path.join(temp_directory, '%s.npy' % key),
+                    np.asarray(value))
+            header['arrays'].append(key)
+    with open(os.path.join(temp_directory, DATA_HEADER_FILE), 'w') as f:
+        json.dump(header, f, indent=4)
 
-        return data
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.rename(temp_directory, directory)
+
+def load_data(path):
+    """
+    Load unpacked data saved by save_data without reading any of its arrays;
+    pickled data from older versions of this module is also accepted, and is
+    converted once with save_data(load_data(pickle_file), directory).
+    """
+    if not os.path.isdir(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    with open(os.path.join(path, DATA_HEADER_FILE), 'r') as f:
+        header = json.load(f)
+    if header['version'] > DATA_FORMAT_VERSION:
+        raise ValueError('Unsupported data format version %d!' %
+                         header['version'])
+    return UnpackedData(path, header)
+
+def plot_rti(data):
+    """
+    Plot Range-Time Intensity of unpacked data; returns figure, axes and image.
+    """
+    range_formatter = value_formatter(data['range_bins'])
+    pulse_formatter = value_formatter((data['time_stamp'] - data['time_stamp'][0])/ 1000)
+    
+    f = Figure(figsize=(5, 5), dpi=100)
+    ax = f.add_subplot(111)
+    img = ax.imshow(20 * np.log10(np.abs(data['scan_data'])))
+    ax.set_aspect('auto')
+    ax.set_title('Range-Time Intensity')
+    ax.set_xlabel('Range (m) [Range Bin Number]')
+    ax.set_ylabel('Time Elapsed (s) [Pulse Number]')
+    ax.xaxis.set_major_formatter(range_formatter)
+    ax.yaxis.set_major_formatter(pulse_formatter)
+    cbar = f.colorbar(img)
+    cbar.ax.set_ylabel('dB')
+    
+    return (f, ax, img)
 
 def parse_args(args):
     """
@@ -153,12 +727,21 @@ def parse_args(args):
     parser = argparse.ArgumentParser(
             description='PulsON 440 radar data unpacker')
     parser.add_argument('-f', '--file', dest='file', help='PulsON 440 data file')
-    parser.add_argument('-o', '--output', nargs='?', const='data.dat', default='',
-                        dest='output', help='Output file; data will be pickled')
+    parser.add_argument('-o', '--output', nargs='?', const='data', default='',
+                        dest='output',
+                        help='Output directory; one memory-mappable file per array')
+    parser.add_argument('-p', '--pickle', action='store_true', dest='pickle',
+                        help='Pickle data to the output file instead')
     parser.add_argument('-v', '--visualize', action='store_true', dest='visualize',
                         help='Plot RTI of unpacked data; will block computation')
-    parser.add_argument('-l --legacy', action='store_true', dest='legacy',
-                        help='Load legacy format of file')
+    parser.add_argument('-l', '--legacy', action='store_const', const=True,
+                        default=None, dest='legacy',
+                        help=('Load legacy format of file; detected '
+                              'automatically by default'))
+    parser.add_argument('-F', '--follow', nargs='?', type=float, const=1.0,
+                        default=None, dest='follow',
+                        help=('Follow a file that is still being written, '
+                              'polling every FOLLOW seconds until Ctrl-C'))
     
     return parser.parse_args(args)
 
@@ -169,32 +752,23 @@ def main(args):
     """
     args = parse_args(args)
     
-    data = unpack(args.file, args.legacy)
+    if args.follow is None:
+        data = unpack(args.file, args.legacy)
+    else:
+        data = follow(args.file, args.follow, legacy=args.legacy)
     
-    # Save (pickle) unpacked data
+    # Save unpacked data
     if args.output:
-        with open(args.output, 'wb') as o:
-            pickle.dump(data, o)
+        if args.pickle:
+            with open(args.output, 'wb') as o:
+                pickle.dump(data, o)
+        else:
+            save_data(data, args.output)
 
     # Visualize RTI of unpacked data
     plt.ioff()
     if args.visualize:
-        range_formatter = value_formatter(data['range_bins'])
-        pulse_formatter = value_formatter((data['time_stamp'] - data['time_stamp'][0])/ 1000)
-        
-        f = Figure(figsize=(5, 5), dpi=100)
-        ax = f.add_subplot(111)
-        img = ax.imshow(20 * np.log10(np.abs(data['scan_data'])))
-        ax.set_aspect('auto')
-        ax.set_title('Range-Time Intensity')
-        ax.set_xlabel('Range (m) [Range Bin Number]')
-        ax.set_ylabel('Time Elapsed (s) [Pulse Number]')
-        ax.xaxis.set_major_formatter(range_formatter)
-        ax.yaxis.set_major_formatter(pulse_formatter)
-        cbar = f.colorbar(img)
-        cbar.ax.set_ylabel('dB')
-        
-        return (f, ax, img)
+        return plot_rti(data)
         
         """
         ax.set_aspect('auto')
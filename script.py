@@ -1,10 +1,8 @@
-import os
 import math
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.signal as sig
-from pulson440_formats import CONFIG_MSG_FORMAT
-from pulson440_constants import SPEED_OF_LIGHT, T_BIN, DN_BIN
+from pulson440_unpack import unpack
 import pandas
 import timeit
 import random
@@ -14,100 +12,6 @@ pulse_data = 'day2_people'
 platform_position_data = '5vertlineallen.csv'
 size = 500
 
-def read_config_data(file_handle, legacy=False):
-    """
-    Read in configuration data based on platform.
-    """
-    config = dict.fromkeys(CONFIG_MSG_FORMAT.keys())
-    
-    if legacy:
-        config_msg = file_handle.read(44)
-        config['node_id'] = np.frombuffer(config_msg[4:8], dtype='>u4')[0]
-        config['scan_start'] = np.frombuffer(config_msg[8:12], dtype='>i4')[0]
-        config['scan_stop'] = np.frombuffer(config_msg[12:16], dtype='>i4')[0]
-        config['scan_res'] = np.frombuffer(config_msg[16:18], dtype='>u2')[0]
-        config['pii'] = np.frombuffer(config_msg[18:20], dtype='>u2')[0]
-        config['ant_mode'] = np.uint16(config_msg[32])
-        config['tx_gain_ind'] = np.uint16(config_msg[33])
-        config['code_channel'] = np.uint16(config_msg[34])
-        config['persist_flag'] = np.uint16(config_msg[35])
-        
-    else:
-        config_msg = file_handle.read(32)
-        byte_counter = 0
-        for config_field in CONFIG_MSG_FORMAT.keys():
-            num_bytes = CONFIG_MSG_FORMAT[config_field].itemsize
-            config_data = config_msg[byte_counter:(byte_counter + num_bytes)]
-            config[config_field] = np.frombuffer(config_data,
-                  dtype=CONFIG_MSG_FORMAT[config_field])[0]
-            config[config_field] = config[config_field].byteswap()
-            byte_counter += num_bytes
-            
-    return config
-
-def unpack(file, legacy=False):
-    """
-    Unpacks PulsOn 440 radar data from input file
-    """
-    with open(file, 'rb') as f:
-        config = read_config_data(f, legacy)
-        
-        scan_start_time = float(config['scan_start'])
-        scan_end_time = float(config['scan_stop'])
-        num_range_bins = DN_BIN * math.ceil((scan_end_time - scan_start_time) /
-                                           (T_BIN * 1000 * DN_BIN))
-        num_packets_per_scan = math.ceil(num_range_bins / 350)
-        start_range = SPEED_OF_LIGHT * ((scan_start_time * 1e-12) - DT_0 * 1e-9) / 2
-        drange_bins = SPEED_OF_LIGHT * T_BIN * 1e-9 / 2
-        range_bins = start_range + drange_bins * np.arange(0, num_range_bins, 1)
-        
-        data = dict()
-        data= {'scan_data': [],
-               'time_stamp': [],
-               'packet_ind': [],
-               'packet_pulse_ind': [],
-               'range_bins': range_bins}
-        single_scan_data = []
-        packet_count = 0
-        pulse_count = 0
-        
-        while True:
-            packet = f.read(1452)
-            if len(packet) < 1452:
-                break            
-            packet_count += 1
-            
-            data['packet_ind'].append(np.frombuffer(packet[48:50], dtype='u2'))
-            
-            if packet_count % num_packets_per_scan == 0:
-                num_samples = num_range_bins % 350
-                packet_data = np.frombuffer(packet[52:(52 + 4 * num_samples)], 
-                                                   dtype='>i4')
-                single_scan_data.append(packet_data)
-                data['scan_data'].append(np.concatenate(single_scan_data))
-                data['time_stamp'].append(np.frombuffer(packet[8:12], 
-                    dtype='>u4'))
-                single_scan_data = []
-                pulse_count += 1
-            else:
-                num_samples = 350
-                packet_data = np.frombuffer(packet[52:(52 + 4 * num_samples)], 
-                                                   dtype='>i4')
-                single_scan_data.append(packet_data)
-            
-        if single_scan_data:
-            single_scan_data = np.concatenate(single_scan_data)
-            num_pad = data['scan_data'][0].size - single_scan_data.size
-            single_scan_data = np.pad(single_scan_data, (0, num_pad), 
-                                      'constant', constant_values=0)
-            data['scan_data'].append(single_scan_data)
-                
-        data['scan_data'] = np.stack(data['scan_data'])
-        
-        data['time_stamp']
-
-        return data
-
 def extract_complex_pulse():
     data = unpack(pulse_data)
     